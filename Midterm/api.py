@@ -0,0 +1,164 @@
+# api.py
+import gzip
+import json
+
+from flask import Blueprint, abort, current_app, request
+from sqlalchemy import desc, select
+from werkzeug.exceptions import HTTPException
+
+from cache import get_cache, listing_key
+from conditional import conditional, make_etag
+from extensions import db
+from listing import listing_validators
+from models import Recipe, User
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# FIELDS A CLIENT MAY ASK FOR WITH ?fields=; id IS ALWAYS SENT
+RECIPE_FIELDS = ('id', 'title', 'description', 'category', 'likes', 'image', 'ingredient_lines',
+                 'instruction_steps', 'user_id', 'author', 'updated_at')
+DEFAULT_FIELDS = ('id', 'title', 'description', 'image', 'likes', 'user_id')
+
+
+def _default(value):
+    return value.isoformat()  # datetimes, the only other type the columns hold
+
+
+def dumps(payload):
+    """Serialize to compact JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=_default).encode()
+
+
+def _wants_gzip():
+    min_bytes = current_app.config['API_GZIP_MIN_BYTES']
+    return min_bytes is not None and bool(request.accept_encodings['gzip'])
+
+
+def json_response(payload, status=200):
+    body = dumps(payload)
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    if _wants_gzip() and len(body) >= current_app.config['API_GZIP_MIN_BYTES']:
+        response.set_data(gzip.compress(body, current_app.config['API_GZIP_LEVEL']))
+        response.content_encoding = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def requested_fields():
+    """The ``fields`` query argument as a tuple of names, ``id`` first."""
+    value = request.args.get('fields')
+    if not value:
+        return DEFAULT_FIELDS
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(RECIPE_FIELDS))
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}")
+    return ('id',) + tuple(dict.fromkeys(name for name in names if name != 'id'))
+
+
+def recipe_select(fields):
+    """SELECT of only the columns behind ``fields``, plus the validators.
+
+    Rows come back as tuples, not ``Recipe`` objects, so nothing else is
+    loaded and there is no identity map to fill.
+    """
+    columns = [User.username.label('author') if name == 'author' else getattr(Recipe, name) for name in fields]
+    query = select(*columns, Recipe.version.label('_version'), Recipe.updated_at.label('_updated_at'))
+    if 'author' in fields:
+        query = query.join(User, Recipe.user_id == User.id)
+    return query
+
+
+def _split(rows, fields):
+    """(field dicts, [(id, version)], newest updated_at) of selected rows."""
+    size = len(fields)
+    items = [dict(zip(fields, row[:size])) for row in rows]
+    versions = [(row[0], row[size]) for row in rows]
+    last_modified = max((row[size + 1] for row in rows if row[size + 1]), default=None)
+    return items, versions, last_modified
+
+
+def _ids():
+    try:
+        ids = list(dict.fromkeys(int(value) for value in request.args.get('ids', '').split(',') if value.strip()))
+    except ValueError:
+        abort(400, 'ids must be a comma-separated list of integers')
+    if not ids:
+        abort(400, 'ids is required')
+    if len(ids) > current_app.config['API_MAX_BATCH']:
+        abort(400, f"At most {current_app.config['API_MAX_BATCH']} ids per request")
+    return ids
+
+
+@bp.errorhandler(HTTPException)
+def http_error(error):
+    return json_response({'error': error.description}, error.code)
+
+
+@bp.route('/recipes')
+def recipes():
+    # Many recipes in one round trip: GET /api/v1/recipes?ids=1,2,3&fields=title,likes
+    fields = requested_fields()
+    ids = _ids()
+    rows = db.session.execute(recipe_select(fields).where(Recipe.id.in_(ids))).all()
+    items, versions, last_modified = _split(rows, fields)
+    by_id = {item['id']: item for item in items}
+    etag = make_etag('api.recipes', fields, ids, sorted(versions), _wants_gzip())
+    return conditional(etag, last_modified, lambda: json_response({
+        'data': [by_id[recipe_id] for recipe_id in ids if recipe_id in by_id],
+        'missing': [recipe_id for recipe_id in ids if recipe_id not in by_id],
+    }))
+
+
+@bp.route('/recipes/<int:recipe_id>')
+def recipe(recipe_id):
+    fields = requested_fields()
+    row = db.session.execute(recipe_select(fields).where(Recipe.id == recipe_id)).first()
+    if row is None:
+        abort(404, 'No such recipe')
+    (item,), versions, last_modified = _split([row], fields)
+    etag = make_etag('api.recipe', fields, versions, _wants_gzip())
+    return conditional(etag, last_modified, lambda: json_response({'data': item}))
+
+
+@bp.route('/categories/<category_name>/recipes')
+def category_recipes(category_name):
+    # Newest first; pass next_cursor back as ?after= for the following page
+    fields = requested_fields()
+    after = request.args.get('after', type=int)
+    limit = min(request.args.get('limit', current_app.config['LISTING_PAGE_SIZE'], type=int),
+                current_app.config['API_MAX_PAGE_SIZE'])
+    if limit < 1:
+        abort(400, 'limit must be positive')
+    validators = listing_validators(Recipe, category_name)
+
+    def fetch():
+        query = recipe_select(fields).where(Recipe.category == category_name)
+        if after is not None:
+            query = query.where(Recipe.id < after)
+        # ONE EXTRA ROW TELLS WHETHER ANOTHER PAGE EXISTS
+        rows = db.session.execute(query.order_by(desc(Recipe.id)).limit(limit + 1)).all()
+        items = _split(rows[:limit], fields)[0]
+        return {'data': items, 'next_cursor': rows[limit - 1][0] if len(rows) > limit else None}
+
+    def render():
+        key = f"{listing_key(category_name, *validators)}api:{','.join(fields)}:after={after}:limit={limit}"
+        return json_response(get_cache().get_or_set(key, fetch))
+
+    etag = make_etag('api.category', category_name, fields, after, limit, *validators, _wants_gzip())
+    return conditional(etag, validators.last_modified, render)
+
+
+@bp.route('/users/<int:user_id>')
+def user(user_id):
+    row = db.session.execute(select(User.id, User.username).where(User.id == user_id)).first()
+    if row is None:
+        abort(404, 'No such user')
+    return json_response({'data': {'id': row.id, 'username': row.username}})
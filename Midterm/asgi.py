@@ -0,0 +1,15 @@
+# asgi.py
+"""ASGI entry point.
+
+    SERVER_MODE=asgi gunicorn -c gunicorn.conf.py
+    uvicorn asgi:app --workers 4
+
+The category listings, recipe pages and search run as async views on an
+aiosqlite engine (async_views.py); everything else runs on a thread pool.
+See serving.py.
+"""
+from app import create_app
+from serving import AsgiAdapter
+import async_views  # noqa: F401  (registers the async views)
+
+app = AsgiAdapter(create_app())
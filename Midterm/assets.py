@@ -0,0 +1,173 @@
+# assets.py
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from werkzeug.utils import send_from_directory
+
+BUILD_DIR = 'build'  # Under the static folder
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')  # Images are compressed already
+ONE_YEAR = 365 * 24 * 60 * 60
+
+assets_cli = AppGroup('assets', help='Build fingerprinted static files.')
+
+
+def _compressors():
+    """(Content-Encoding, file suffix, function) for each precompressed variant, best first."""
+    compressors = []
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        compressors.append(('br', '.br', lambda data: brotli.compress(data, quality=11)))
+    compressors.append(('gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0)))
+    return compressors
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)  # NEVER SERVE A HALF-WRITTEN FILE
+
+
+def build(static_folder, sources):
+    """Copy each of ``sources`` to ``build/<name>.<hash><ext>`` with compressed variants.
+
+    Returns the manifest (also written to ``build/manifest.json``): logical
+    name -> ``{'path': ..., 'encodings': [...]}``. A variant is only kept
+    when it is smaller than the original. Earlier builds are left in place so
+    pages already sent keep working; ``prune`` removes them.
+    """
+    compressors = _compressors()
+    manifest = {}
+    for name in sources:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        root, ext = os.path.splitext(name)
+        hashed = f'{BUILD_DIR}/{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        path = os.path.join(static_folder, hashed)
+        if not os.path.exists(path):
+            _write(path, data)
+        encodings = []
+        if ext.lower() in COMPRESSIBLE:
+            for encoding, suffix, compress in compressors:
+                if not os.path.exists(path + suffix):
+                    packed = compress(data)
+                    if len(packed) >= len(data):
+                        continue
+                    _write(path + suffix, packed)
+                encodings.append(encoding)
+        manifest[name] = {'path': hashed, 'encodings': encodings}
+    _write(os.path.join(static_folder, BUILD_DIR, MANIFEST), json.dumps(manifest, indent=2).encode())
+    return manifest
+
+
+def prune(static_folder, manifest):
+    """Delete built files the manifest no longer names; returns how many."""
+    keep = set()
+    for entry in manifest.values():
+        path = os.path.join(static_folder, entry['path'])
+        keep.add(path)
+        keep.update(path + suffix for _, suffix, _ in _compressors())
+    removed = 0
+    for top, _, files in os.walk(os.path.join(static_folder, BUILD_DIR)):
+        for name in files:
+            path = os.path.join(top, name)
+            if path not in keep and name != MANIFEST:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def load_manifest(app):
+    """The built manifest of ``app``, read once per process; empty before the first build."""
+    state = app.extensions.setdefault('assets', {})
+    if 'manifest' not in state:
+        manifest = {}
+        if app.config['STATIC_FINGERPRINT']:
+            try:
+                with open(os.path.join(app.static_folder, BUILD_DIR, MANIFEST)) as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                pass
+        state['manifest'] = manifest
+        # BUILT PATH -> ENCODINGS AVAILABLE FOR IT
+        state['built'] = {entry['path']: entry['encodings'] for entry in manifest.values()}
+    return state
+
+
+def _fingerprint(endpoint, values):
+    # url_for('static', filename='main.css') -> /static/build/main.<hash>.css
+    if endpoint == 'static' and 'filename' in values:
+        entry = load_manifest(current_app)['manifest'].get(values['filename'])
+        if entry is not None:
+            values['filename'] = entry['path']
+
+
+def static_view(filename):
+    """Replaces Flask's static view: built files are immutable and precompressed.
+
+    Everything else is sent as Flask would. With STATIC_SENDFILE the body is
+    left to the front-end server (``X-Sendfile`` for Apache/lighttpd,
+    ``X-Accel-Redirect`` to STATIC_ACCEL_PREFIX for nginx), so no worker
+    streams static bytes.
+    """
+    app = current_app
+    sendfile = app.config['STATIC_SENDFILE']
+    encodings = load_manifest(app)['built'].get(filename)
+    if encodings is None and not sendfile:
+        return app.send_static_file(filename)
+
+    path, encoding = filename, None
+    for candidate, suffix, _ in _compressors():
+        if candidate in (encodings or ()) and request.accept_encodings[candidate]:
+            path, encoding = filename + suffix, candidate
+            break
+    if encodings is None:
+        options = {'max_age': app.get_send_file_max_age(filename)}
+    else:
+        # THE HASH IS IN THE NAME, SO IT IS A STRONG VALIDATOR FOR EVERY VARIANT
+        options = {'max_age': ONE_YEAR, 'etag': os.path.basename(filename) + (f'-{encoding}' if encoding else '')}
+    response = send_from_directory(app.static_folder, path, request.environ,
+                                   mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                                   use_x_sendfile=bool(sendfile), **options)
+    if encodings is not None:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        if encodings:
+            response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    if sendfile == 'x-accel-redirect' and 'X-Sendfile' in response.headers:
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = app.config['STATIC_ACCEL_PREFIX'] + path
+    return response
+
+
+@assets_cli.command('build')
+@click.option('--prune', 'prune_old', is_flag=True, help='Also delete files of earlier builds.')
+def build_command(prune_old):
+    """Fingerprint and precompress STATIC_ASSETS into static/build."""
+    folder = current_app.static_folder
+    manifest = build(folder, current_app.config['STATIC_ASSETS'])
+    for name, entry in manifest.items():
+        click.echo(f"{name} -> {entry['path']} {' '.join(entry['encodings'])}")
+    if prune_old:
+        click.echo(f'Removed {prune(folder, manifest)} old files.')
+
+
+def init_app(app):
+    """Link and serve the built assets; run ``flask assets build`` on every deploy."""
+    if app.has_static_folder:
+        app.url_defaults(_fingerprint)
+        app.view_functions['static'] = static_view
+    app.cli.add_command(assets_cli)
@@ -0,0 +1,169 @@
+# async_views.py
+"""Async versions of the read-heavy views, used when serving under ASGI.
+
+Each renders the same template from the same data (and the same cache
+keys) as its sync view in recipes.py or search.py, but reads the database
+through the async engine, so the worker's event loop serves other
+requests while a query runs. The calls that still block (cache reads and
+writes, template rendering, the like buffer) go through ``run_sync``.
+"""
+from flask import abort, current_app, render_template, request, stream_template
+from flask_login import current_user
+from sqlalchemy import desc, func, select
+
+import likes
+import recipe_text
+import search_index
+from cache import MISS, get_cache, listing_key, recipe_key
+from conditional import conditional_async, make_etag
+from listing import CARD_COLUMNS, Author, Card, ListingValidators, Page, RecipeDetail
+from models import Recipe, User
+from serving import async_engine, async_view, run_sync
+
+
+async def _rows(statement):
+    async with async_engine().connect() as connection:
+        return (await connection.execute(statement)).all()
+
+
+async def _first(statement):
+    rows = await _rows(statement.limit(1))
+    return rows[0] if rows else None
+
+
+async def _get_or_set(key, fetch):
+    cache = get_cache()
+    value = await run_sync(cache.get, key)
+    if value is MISS:
+        value = await fetch()
+        await run_sync(cache.set, key, value)
+    return value
+
+
+def _render_recipe(recipe, version):
+    likes_count = (recipe.likes or 0) + likes.pending_likes(recipe.id)
+    return render_template('view_recipe.html', recipe=recipe, version=version, likes_count=likes_count)
+
+
+def _recipe_etag(recipe_id, version):
+    return make_etag('recipe', recipe_id, version, likes.pending_likes(recipe_id))
+
+
+@async_view('recipes.view_recipe')
+async def view_recipe(recipe_id):
+    current = await _first(select(Recipe.version, Recipe.updated_at).where(Recipe.id == recipe_id))
+    if current is None:
+        abort(404)
+
+    async def render():
+        async def fetch():
+            columns = [getattr(Recipe, name) for name in RecipeDetail._fields]
+            return RecipeDetail(*await _first(select(*columns).where(Recipe.id == recipe_id)))
+        recipe = await _get_or_set(recipe_key(recipe_id, current.version) + 'detail', fetch)
+        return await run_sync(_render_recipe, recipe, current.version)
+
+    etag = await run_sync(_recipe_etag, recipe_id, current.version)
+    return await conditional_async(etag, current.updated_at, render)
+
+
+async def render_listing(template, category, **context):
+    """listing.render_listing on the async engine; each card's author comes from one join."""
+    after = request.args.get('after', type=int)
+    validators = ListingValidators(*(await _rows(
+        select(func.count(Recipe.id), func.sum(Recipe.version), func.max(Recipe.id), func.max(Recipe.updated_at))
+        .where(Recipe.category == category)))[0])
+
+    async def render():
+        async def fetch():
+            per_page = current_app.config['LISTING_PAGE_SIZE']
+            statement = (select(*[getattr(Recipe, name) for name in CARD_COLUMNS], User.username)
+                         .outerjoin(User, Recipe.user_id == User.id)
+                         .where(Recipe.category == category)
+                         .order_by(desc(Recipe.id))
+                         .limit(per_page + 1))
+            if after is not None:
+                statement = statement.where(Recipe.id < after)
+            rows = await _rows(statement)
+            cards = [Card(*row[:-1], user=Author(row[-1]) if row[-1] is not None else None)
+                     for row in rows[:per_page]]
+            return Page(cards, rows[per_page - 1].id if len(rows) > per_page else None, per_page)
+        page = await _get_or_set(f'{listing_key(category, *validators)}after={after}', fetch)
+        context.update(recipes=page.items, page=page)
+        if current_app.config['LISTING_STREAM']:
+            # RENDERED ON THE THREAD POOL AS THE ADAPTER READS IT
+            return current_app.response_class(stream_template(template, **context))
+        return await run_sync(render_template, template, **context)
+
+    etag = make_etag(template, category, after, *validators)
+    return await conditional_async(etag, validators.last_modified, render)
+
+
+@async_view('recipes.category')
+async def category(category_name):
+    return await render_listing('category.html', category_name, category_name=category_name)
+
+
+@async_view('recipes.main_dish')
+async def main_dish():
+    return await render_listing('main_dish.html', 'main_dish')
+
+
+@async_view('recipes.vegetables')
+async def vegetables():
+    return await render_listing('vegetables.html', 'vegetables')
+
+
+@async_view('recipes.cocktail')
+async def cocktail():
+    return await render_listing('cocktail.html', 'cocktail')
+
+
+@async_view('recipes.dessert')
+async def dessert():
+    username = str(current_user.username) if current_user.is_authenticated else ''
+    return await render_listing('dessert.html', 'dessert', username=username)
+
+
+async def _search_page(query, ingredient, page, per_page):
+    columns = (Recipe.id, Recipe.title, Recipe.version, Recipe.updated_at)
+    offset = (page - 1) * per_page
+    if ingredient or not search_index.fts_supported(async_engine()):
+        if ingredient:
+            term = recipe_text.normalize_term(ingredient)
+            if term is None:
+                return search_index.SearchPage([], page, False, per_page)
+            criterion = search_index.ingredient_criterion(Recipe, term)
+        else:
+            criterion = Recipe.title.ilike(f'%{query}%')
+        rows = await _rows(select(*columns).where(criterion)
+                           .order_by(desc(Recipe.id)).offset(offset).limit(per_page + 1))
+        return search_index.SearchPage(rows[:per_page], page, len(rows) > per_page, per_page)
+
+    expression = search_index.match_expression(query)
+    if expression is None:
+        return search_index.SearchPage([], page, False, per_page)
+    ids = [row[0] for row in await _rows(search_index.match_statement(expression, per_page + 1, offset))]
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    if not ids:
+        return search_index.SearchPage([], page, False, per_page)
+    position = {recipe_id: i for i, recipe_id in enumerate(ids)}
+    rows = sorted(await _rows(select(*columns).where(Recipe.id.in_(ids))), key=lambda row: position[row.id])
+    return search_index.SearchPage(rows, page, has_next, per_page)
+
+
+@async_view('search.search')
+async def search():
+    query = request.args.get('query', '')
+    ingredient = request.args.get('ingredient')
+    page = request.args.get('page', 1, type=int)
+    results = await _search_page(query, ingredient, max(page, 1), current_app.config['SEARCH_PAGE_SIZE'])
+    etag = make_etag('search', query, ingredient, page, results.has_next,
+                     [(recipe.id, recipe.version) for recipe in results.items])
+    last_modified = max((recipe.updated_at for recipe in results.items if recipe.updated_at), default=None)
+
+    async def render():
+        return await run_sync(render_template, 'search_results.html', recipes=results.items, results=results,
+                              query=query, ingredient=ingredient)
+
+    return await conditional_async(etag, last_modified, render)
@@ -0,0 +1,66 @@
+# auth.py
+from flask import Blueprint, render_template, redirect, url_for, flash
+from flask_login import login_user, login_required, logout_user
+
+from extensions import db, login_manager
+from form import RegistrationForm, LoginForm
+from models import User
+import identity
+
+bp = Blueprint('auth', __name__)
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    # Cached id/username/email, not the User row: no query on most requests
+    return identity.load_principal(User, int(user_id))
+
+# Login
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    form = LoginForm()  # Create an instance of the LoginForm
+    if form.validate_on_submit():  # Check if form is submitted and valid
+        username = form.username.data
+        password = form.password.data
+        user = User.query.filter_by(username=username).first()
+        if user and user.check_password(password):  # Check if user exists and password is correct
+            if user.password_needs_rehash():
+                # Stored with an older method or cost; upgrade it while we have the password
+                user.set_password(password)
+                db.session.commit()
+            login_user(user)  # Log in the user
+            flash('Logged in successfully.', 'success')
+            # Redirect to the index page where all recipes are displayed
+            return redirect(url_for('recipes.index'))
+        else:
+            flash('Invalid username or password. Please try again.', 'error')
+    return render_template('login.html', form=form)  # Pass the LoginForm object to the template
+
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    form = RegistrationForm()  # Create an instance of the RegistrationForm
+    if form.validate_on_submit():  # Check if form is submitted and valid
+        username = form.username.data
+        email = form.email.data
+        password = form.password.data
+        existing_user = User.query.filter_by(username=username).first()
+        if existing_user:
+            flash('Username already exists. Please choose a different one.', 'error')
+            return redirect(url_for('auth.register'))  # Redirect to register page if username already exists
+        new_user = User(username=username, email=email)
+        new_user.set_password(password)  # Set the password for the new user
+        db.session.add(new_user)  # Add the new user to the database
+        db.session.commit()  # Commit changes to the database
+        login_user(new_user)  # Log in the newly registered user
+        flash('Account created successfully. Welcome!', 'success')
+        return redirect(url_for('recipes.index'))  # Redirect to view_recipe page after successful registration
+    return render_template('register.html', form=form)  # Pass the RegistrationForm object to the template
+
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('You have been logged out.', 'success')
+    return redirect(url_for('auth.login'))
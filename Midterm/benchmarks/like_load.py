@@ -0,0 +1,94 @@
+"""Concurrent like load test.
+
+Seeds a temporary SQLite database with one recipe and N users, then has
+every user like the recipe from a pool of threads, once per strategy:
+
+* ``read-modify-write`` -- the old like_recipe (load, ``likes += 1``, commit)
+* ``atomic`` -- likes.like_recipe with ``UPDATE ... SET likes = likes + 1``
+* ``buffered`` -- likes.like_recipe with LIKES_BUFFERED
+
+For each it prints likes/sec and how many increments were lost.
+
+Usage: python benchmarks/like_load.py [--users 2000] [--threads 16]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DB_DIR = tempfile.mkdtemp(prefix='like-load-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DB_DIR, 'likes.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Recipe, RecipeLike, User  # noqa: E402
+import likes  # noqa: E402
+
+app = create_app()
+
+
+def read_modify_write(user_id, recipe_id):
+    recipe = db.session.get(Recipe, recipe_id)
+    recipe.likes = (recipe.likes or 0) + 1
+    db.session.commit()
+
+
+def atomic(user_id, recipe_id):
+    likes.like_recipe(Recipe, RecipeLike, user_id, recipe_id)
+
+
+def seed(users):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all(User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x')
+                           for i in range(users))
+        db.session.flush()
+        recipe = Recipe(title='Hot recipe', description='d', ingredients='i', instructions='i',
+                        likes=0, category='dessert', user_id=1)
+        db.session.add(recipe)
+        db.session.commit()
+        return [user.id for user in User.query.all()], recipe.id
+
+
+def run(name, like, users, threads, buffered=False):
+    user_ids, recipe_id = seed(users)
+    app.config['LIKES_BUFFERED'] = buffered
+
+    def worker(user_id):
+        with app.app_context():
+            for attempt in range(20):
+                try:
+                    like(user_id, recipe_id)
+                    return
+                except Exception:
+                    db.session.rollback()  # "database is locked"; try again
+                    time.sleep(0.01 * (attempt + 1))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, user_ids))
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        if buffered:
+            likes.flush_likes(Recipe)
+        stored = db.session.get(Recipe, recipe_id).likes
+    print(f'{name:>18}: {users / elapsed:8.0f} likes/sec, '
+          f'{stored}/{users} stored, {users - stored} lost')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+    run('read-modify-write', read_modify_write, args.users, args.threads)
+    run('atomic', atomic, args.users, args.threads)
+    run('buffered', atomic, args.users, args.threads, buffered=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Concurrent login benchmark.
+
+Seeds a temporary SQLite database with --users users, then logs all of them
+in through the login form from --threads client threads, once per
+PASSWORD_HASH_METHOD and PASSWORD_WORKERS combination. Meanwhile another
+thread keeps requesting a cheap page, to show whether the login burst
+starves the rest of the app.
+
+For each run it prints logins/sec, how many logins were turned away (503),
+and the p50/p95 latency of the cheap page.
+
+Usage: python benchmarks/login_benchmark.py [--users 200] [--threads 16]
+           [--method scrypt --method pbkdf2:sha256:600000] [--workers 2 --workers 16]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DB_DIR = tempfile.mkdtemp(prefix='login-benchmark-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DB_DIR, 'users.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User  # noqa: E402
+import passwords  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def seed(app, users, method):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # ONE HASH FOR EVERYONE; ONLY THE LOGINS ARE MEASURED
+        password_hash = generate_password_hash(PASSWORD, method)
+        db.session.add_all(User(username=f'user{i}', email=f'user{i}@example.com',
+                                password_hash=password_hash) for i in range(users))
+        db.session.commit()
+
+
+def run(method, workers, users, threads):
+    app = create_app({'PASSWORD_HASH_METHOD': method, 'PASSWORD_WORKERS': workers,
+                      'WTF_CSRF_ENABLED': False})
+    seed(app, users, method)
+    passwords._executor = None  # A FRESH POOL SIZED FOR THIS RUN
+
+    done = threading.Event()
+    probe_latencies = []
+
+    def probe():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/cache/stats')
+            probe_latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    def login(i):
+        response = app.test_client().post('/login', data={'username': f'user{i}', 'password': PASSWORD})
+        return response.status_code
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(login, range(users)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    ok = statuses.count(302)
+    probe_ms = sorted(latency * 1000 for latency in probe_latencies)
+    p95 = probe_ms[int(len(probe_ms) * 0.95)] if probe_ms else 0.0
+    print(f'{method:>24} workers={workers:<3}: {ok / elapsed:7.1f} logins/sec, '
+          f'{statuses.count(503)} turned away, other page p50 '
+          f'{statistics.median(probe_ms or [0]):6.1f} ms p95 {p95:6.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--method', action='append', help='PASSWORD_HASH_METHOD (repeatable).')
+    parser.add_argument('--workers', action='append', type=int, help='PASSWORD_WORKERS (repeatable).')
+    args = parser.parse_args()
+    for method in args.method or ['scrypt', 'pbkdf2:sha256:600000']:
+        for workers in args.workers or [2, os.cpu_count() or 4]:
+            run(method, workers, args.users, args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+"""Route benchmark with seeded datasets.
+
+Seeds a temporary SQLite database (and image folder) with --users users,
+--recipes recipes per category and --images stored images, then requests
+each route --requests times and reports, per route, p50/p95/p99 latency,
+requests/sec, SQL queries per request and the peak RSS of this process.
+
+By default requests go through the Flask test client one at a time. With
+--http the app is served on a local threaded HTTP server instead and
+--threads clients request it concurrently. The page cache is off
+(--cache null) so every request does its real work.
+
+Results can be saved with --output and two saved runs compared; a route is
+flagged when its p95 grew by more than --threshold or it makes more queries.
+
+Usage: python benchmarks/route_benchmark.py run [--users 50] [--recipes 1000] [--images 20]
+           [--requests 200] [--http --threads 8] [--login] [--output results.json]
+       python benchmarks/route_benchmark.py compare old.json new.json [--threshold 0.15]
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DB_DIR = tempfile.mkdtemp(prefix='route-benchmark-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DB_DIR, 'recipes.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CATEGORIES = ('main_dish', 'vegetables', 'cocktail', 'dessert')
+INGREDIENTS = ('flour', 'sugar', 'eggs', 'butter', 'basil', 'garlic', 'lemon', 'olive oil',
+               'tomatoes', 'rice', 'chicken', 'mint', 'lime', 'rum', 'onion', 'paprika')
+WORDS = ('quick', 'classic', 'spicy', 'summer', 'creamy', 'crispy', 'easy', 'smoky', 'fresh', 'golden')
+PASSWORD = 'benchmark password'
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KILOBYTES ON LINUX, BYTES ON MACOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def make_images(count):
+    """Store ``count`` distinct JPEGs (and their resized copies); returns their keys."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    from flask import current_app
+
+    import image_pipeline
+    import image_store
+
+    folder = image_pipeline.store_folder()
+    keys = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), (i * 37 % 256, i * 91 % 256, i * 13 % 256)).save(buffer, 'JPEG')
+        buffer.seek(0)
+        keys.append(image_store.write_image(folder, buffer, '.jpg')[0])
+    image_pipeline.backfill_derivatives(folder, keys, tuple(current_app.config['IMAGE_WIDTHS']))
+    return keys
+
+
+def fake_recipe(rng, category, username, images):
+    title = f'{rng.choice(WORDS).title()} {rng.choice(INGREDIENTS)} {rng.randrange(10**6)}'
+    ingredients = rng.sample(INGREDIENTS, 6)
+    return {
+        'title': title,
+        'description': f'A {rng.choice(WORDS)} {category.replace("_", " ")} with {ingredients[0]}.',
+        'ingredients': '\n'.join(f'{rng.randint(1, 4)} cups {name}' for name in ingredients),
+        'instructions': '\n'.join(f'Step {step}: {rng.choice(WORDS)} {rng.choice(INGREDIENTS)}.'
+                                  for step in range(1, 9)),
+        'image': rng.choice(images) if images else None,
+        'likes': rng.randrange(500),
+        'category': category,
+        'username': username,
+    }
+
+
+def seed(app, users, recipes_per_category, images, seed_value=0):
+    """Fill the empty database; the same arguments always give the same data."""
+    from werkzeug.security import generate_password_hash
+
+    from app import init_db
+    from extensions import db
+    from models import ImageRef, Recipe, User
+    import recipe_io
+    import search_index
+
+    rng = random.Random(seed_value)
+    init_db(app)
+    with app.app_context():
+        # ONE HASH FOR EVERYONE; LOGIN IS NOT WHAT IS MEASURED HERE
+        password_hash = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+        db.session.add_all(User(username=f'user{i}', email=f'user{i}@example.com',
+                                password_hash=password_hash) for i in range(users))
+        db.session.commit()
+        image_keys = make_images(images)
+        importer = recipe_io.Importer(db, Recipe, User)
+        with importer.engine.begin() as connection:
+            search_index.drop_search_triggers(connection)
+        rows = (fake_recipe(rng, category, f'user{rng.randrange(users)}', image_keys)
+                for category in CATEGORIES for _ in range(recipes_per_category))
+        for batch in recipe_io._batches(rows, 10000):
+            importer.import_batch(batch)
+        with importer.engine.begin() as connection:
+            search_index.rebuild_search_index(connection)
+        importer.count_image_refs(ImageRef)
+        return db.session.scalars(db.select(Recipe.id).order_by(Recipe.id)).all()
+
+
+def routes(recipe_ids, rng):
+    """Name -> function returning the next URL to request."""
+    return {
+        'index': lambda: '/',
+        'category': lambda: f'/category/{rng.choice(CATEGORIES)}',
+        'category page 5': lambda: '/category/dessert?after=' + str(recipe_ids[-(4 * 24 + 1)]),
+        'dessert': lambda: '/dessert',
+        'main_dish': lambda: '/main_dish',
+        'view_recipe': lambda: f'/view_recipe/{rng.choice(recipe_ids)}',
+        'search': lambda: f'/search?query={rng.choice(WORDS)}+{rng.choice(INGREDIENTS).split()[0]}',
+        'search suggest': lambda: f'/search/suggest?query={rng.choice(INGREDIENTS)[:3]}',
+        'search ingredient': lambda: f'/search?ingredient={rng.choice(INGREDIENTS).split()[0]}',
+    }
+
+
+def summarize(latencies, elapsed, queries, statuses):
+    ms = sorted(latency * 1000 for latency in latencies)
+
+    def percentile(p):
+        return round(ms[min(len(ms) - 1, int(len(ms) * p))], 3)
+
+    return {
+        'requests': len(ms),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'rps': round(len(ms) / elapsed, 1),
+        'queries_per_request': round(queries / len(ms), 2),
+        'statuses': sorted(set(statuses)),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def login(client):
+    client.post('/login', data={'username': 'user0', 'password': PASSWORD})
+
+
+def bench_test_client(app, next_url, requests, warmup, log_in):
+    from extensions import db
+    from instrumentation import count_queries
+
+    client = app.test_client()
+    if log_in:
+        login(client)
+    for _ in range(warmup):
+        client.get(next_url())
+    latencies, statuses = [], []
+    with app.app_context():
+        engine = db.engine
+    with count_queries(engine) as queries:
+        start = time.perf_counter()
+        for _ in range(requests):
+            url = next_url()
+            request_start = time.perf_counter()
+            statuses.append(client.get(url).status_code)
+            latencies.append(time.perf_counter() - request_start)
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed, queries.count, statuses)
+
+
+class LocalServer:
+    """The app on a threaded werkzeug server on a free local port."""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # NO LINE PER REQUEST
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+def bench_http(app, server, next_url, requests, warmup, threads, cookie):
+    from extensions import db
+    from instrumentation import count_queries
+
+    headers = {'Cookie': cookie} if cookie else {}
+
+    def fetch(url):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(server.url + url, headers=headers)) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        return time.perf_counter() - start, status
+
+    for _ in range(warmup):
+        fetch(next_url())
+    with app.app_context():
+        engine = db.engine
+    urls = [next_url() for _ in range(requests)]
+    with count_queries(engine) as queries, ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(fetch, urls))
+        elapsed = time.perf_counter() - start
+    return summarize([r[0] for r in results], elapsed, queries.count, [r[1] for r in results])
+
+
+def run(args):
+    from app import create_app
+
+    upload_dir = os.path.join(DB_DIR, 'images')
+    app = create_app({'CACHE_BACKEND': args.cache, 'UPLOAD_FOLDER': upload_dir,
+                      'IMAGE_STORE_FOLDER': os.path.join(DB_DIR, 'media'),
+                      'WTF_CSRF_ENABLED': False, 'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000'})
+    start = time.perf_counter()
+    recipe_ids = seed(app, args.users, args.recipes, args.images, args.seed)
+    print(f'Seeded {len(recipe_ids)} recipes, {args.users} users, {args.images} images '
+          f'in {time.perf_counter() - start:.1f}s ({DB_DIR})', file=sys.stderr)
+
+    rng = random.Random(args.seed)
+    selected = routes(recipe_ids, rng)
+    if args.route:
+        selected = {name: selected[name] for name in args.route}
+    results = {}
+    cookie = None
+    server = LocalServer(app) if args.http else None
+    if server:
+        server.__enter__()
+        if args.login:
+            client = app.test_client()
+            login(client)
+            session_cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+            cookie = f'{session_cookie.key}={session_cookie.value}'
+    try:
+        for name, next_url in selected.items():
+            if server:
+                results[name] = bench_http(app, server, next_url, args.requests, args.warmup,
+                                           args.threads, cookie)
+            else:
+                results[name] = bench_test_client(app, next_url, args.requests, args.warmup, args.login)
+            r = results[name]
+            print(f'{name:>18}: p50 {r["p50_ms"]:7.2f} ms  p95 {r["p95_ms"]:7.2f} ms  '
+                  f'p99 {r["p99_ms"]:7.2f} ms  {r["rps"]:8.1f} req/s  '
+                  f'{r["queries_per_request"]:5.2f} queries  HTTP {r["statuses"]}')
+    finally:
+        if server:
+            server.__exit__()
+
+    print(f'Peak RSS: {peak_rss_mb()} MB', file=sys.stderr)
+    if args.output:
+        meta = {key: getattr(args, key) for key in
+                ('users', 'recipes', 'images', 'requests', 'http', 'threads', 'login', 'cache', 'seed')}
+        meta.update(python=platform.python_version(), time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'routes': results}, f, indent=2)
+        print(f'Wrote {args.output}', file=sys.stderr)
+
+
+def compare(args):
+    """Print old vs new per route; exit 1 if any route regressed."""
+    with open(args.old) as f:
+        old_run = json.load(f)
+    with open(args.new) as f:
+        new_run = json.load(f)
+    old, new = old_run['routes'], new_run['routes']
+    settings = ('users', 'recipes', 'images', 'http', 'threads', 'login', 'cache')
+    differing = [key for key in settings if old_run['meta'].get(key) != new_run['meta'].get(key)]
+    if differing:
+        print(f'Warning: the runs differ in {", ".join(differing)}; numbers are not comparable.')
+    regressions = 0
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        change = (after['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        # IGNORE SUB-MILLISECOND JITTER ON VERY FAST ROUTES
+        slower = change > args.threshold and after['p95_ms'] - before['p95_ms'] > args.min_ms
+        more_queries = after['queries_per_request'] > before['queries_per_request']
+        flag = 'REGRESSION' if slower or more_queries else ''
+        regressions += bool(flag)
+        print(f'{name:>18}: p95 {before["p95_ms"]:7.2f} -> {after["p95_ms"]:7.2f} ms ({change:+6.1%})  '
+              f'queries {before["queries_per_request"]:5.2f} -> {after["queries_per_request"]:5.2f}  {flag}')
+    for name in sorted(old.keys() ^ new.keys()):
+        print(f'{name:>18}: only in {"old" if name in old else "new"}')
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Seed a dataset and benchmark the routes.')
+    run_parser.add_argument('--users', type=int, default=50)
+    run_parser.add_argument('--recipes', type=int, default=1000, help='Recipes per category.')
+    run_parser.add_argument('--images', type=int, default=20)
+    run_parser.add_argument('--requests', type=int, default=200, help='Requests per route.')
+    run_parser.add_argument('--warmup', type=int, default=10)
+    run_parser.add_argument('--route', action='append', help='Only this route (repeatable).')
+    run_parser.add_argument('--http', action='store_true', help='Serve over local HTTP.')
+    run_parser.add_argument('--threads', type=int, default=8, help='Concurrent clients with --http.')
+    run_parser.add_argument('--login', action='store_true', help='Request as a logged-in user.')
+    run_parser.add_argument('--cache', default='null', help='CACHE_BACKEND for the run.')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    compare_parser = commands.add_parser('compare', help='Compare two saved runs.')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.15, help='Allowed p95 growth.')
+    compare_parser.add_argument('--min-ms', type=float, default=0.5, help='Ignore smaller p95 changes.')
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        sys.exit(compare(args))
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Serving mode benchmark: sync vs threaded vs ASGI workers under concurrent connections.
+
+Seeds a temporary database like route_benchmark.py, then for each
+--mode starts ``gunicorn -c gunicorn.conf.py`` with that SERVER_MODE and
+--workers processes. For each --connections level it keeps that many
+keep-alive connections busy for --duration seconds with a mix of the
+read-heavy routes, and reports requests/sec, p50/p95/p99 latency and
+errors per mode and level. The load generator is one asyncio process;
+give the server the other cores (--workers below the core count) or the
+client becomes the bottleneck.
+
+Usage: python benchmarks/serving_benchmark.py [--modes sync gthread asgi] [--connections 16 64 256]
+           [--workers 2] [--duration 10] [--recipes 1000] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import route_benchmark  # SETS DATABASE_URL TO ITS TEMPORARY DATABASE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('sync', 'gthread', 'asgi')
+ROUTES = ('category', 'dessert', 'view_recipe', 'search', 'search ingredient')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, args):
+    env = dict(os.environ, SERVER_MODE=mode, BIND=f'127.0.0.1:{port}', WEB_WORKERS=str(args.workers),
+               WEB_THREADS=str(args.threads),
+               # APP SETTINGS ARE JSON (FLASK_* ENVIRONMENT VARIABLES)
+               FLASK_CACHE_BACKEND=json.dumps(args.cache),
+               FLASK_SLOW_QUERY_MS='null',  # THE LOG LINES WOULD BE PART OF THE MEASUREMENT
+               FLASK_UPLOAD_FOLDER=json.dumps(os.path.join(route_benchmark.DB_DIR, 'images')),
+               FLASK_IMAGE_STORE_FOLDER=json.dumps(os.path.join(route_benchmark.DB_DIR, 'media')))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+                              cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn ({mode}) exited with {server.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'gunicorn ({mode}) did not start')
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def fetch(reader, writer, path):
+    """One GET on an open connection; returns (status, whether the server closes it)."""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(head[0].split()[1])
+    headers = dict((name.strip().lower(), value.strip()) for name, value in
+                   (line.split(':', 1) for line in head[1:] if line))
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, True
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def connection_loop(port, next_url, stop_at, timeout, latencies, errors):
+    reader = writer = None
+    while time.monotonic() < stop_at:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            start = time.perf_counter()
+            status, closing = await asyncio.wait_for(fetch(reader, writer, next_url()), timeout)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            errors.append(type(e).__name__)
+            closing = True
+        if closing and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(port, next_url, connections, duration, timeout):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    stop_at = time.monotonic() + duration
+    await asyncio.gather(*(connection_loop(port, next_url, stop_at, timeout, latencies, errors)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    ms = sorted(latency * 1000 for latency in latencies)
+
+    def percentile(p):
+        return round(ms[min(len(ms) - 1, int(len(ms) * p))], 2) if ms else None
+
+    return {
+        'requests': len(ms),
+        'rps': round(len(ms) / elapsed, 1),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'mean_ms': round(statistics.fmean(ms), 2) if ms else None,
+        'errors': len(errors),
+        'error_kinds': sorted({str(error) for error in errors}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--connections', nargs='+', type=int, default=[16, 64, 256])
+    parser.add_argument('--workers', type=int, default=2, help='Server processes per mode.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per process in gthread mode.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per connection level.')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds before a request counts as failed.')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--recipes', type=int, default=1000, help='Recipes per category.')
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--cache', default='null', help='CACHE_BACKEND of the servers.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app({'UPLOAD_FOLDER': os.path.join(route_benchmark.DB_DIR, 'images'),
+                      'IMAGE_STORE_FOLDER': os.path.join(route_benchmark.DB_DIR, 'media')})
+    recipe_ids = route_benchmark.seed(app, args.users, args.recipes, args.images, args.seed)
+    print(f'Seeded {len(recipe_ids)} recipes ({route_benchmark.DB_DIR})', file=sys.stderr)
+    rng = random.Random(args.seed)
+    urls = [make for name, make in route_benchmark.routes(recipe_ids, rng).items() if name in ROUTES]
+
+    def next_url():
+        return rng.choice(urls)()
+
+    results = {}
+    for mode in args.modes:
+        port = free_port()
+        server = start_server(mode, port, args)
+        try:
+            asyncio.run(load(port, next_url, 4, 1.0, args.timeout))  # WARM UP POOLS AND CACHES
+            for connections in args.connections:
+                r = asyncio.run(load(port, next_url, connections, args.duration, args.timeout))
+                results.setdefault(mode, {})[str(connections)] = r
+                print(f'{mode:>8} x {connections:>4} connections: {r["rps"]:8.1f} req/s  p50 {r["p50_ms"]} ms  '
+                      f'p95 {r["p95_ms"]} ms  p99 {r["p99_ms"]} ms  errors {r["errors"]} {r["error_kinds"]}')
+        finally:
+            stop_server(server)
+
+    if args.output:
+        meta = {key: getattr(args, key) for key in
+                ('workers', 'threads', 'duration', 'users', 'recipes', 'images', 'cache', 'seed')}
+        meta.update(python=platform.python_version(), cpus=os.cpu_count(),
+                    time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'modes': results}, f, indent=2)
+        print(f'Wrote {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
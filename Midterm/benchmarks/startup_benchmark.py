@@ -0,0 +1,91 @@
+"""Worker startup benchmark: time to first request.
+
+Measures what a new worker pays before it can answer its first request,
+two ways, --repeat times each:
+
+* ``cold`` -- a fresh interpreter imports app, calls create_app() and
+  serves GET / (what every worker does without ``--preload``)
+* ``forked`` -- the app is built once here, then each child is forked from
+  it and only serves GET / (gunicorn ``--preload``)
+
+For each it prints the median import, create_app and first request times.
+
+Usage: python benchmarks/startup_benchmark.py [--repeat 10] [--path /]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = tempfile.mkdtemp(prefix='startup-benchmark-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DB_DIR, 'recipes.db')
+sys.path.insert(0, ROOT)
+
+# RUN IN A FRESH INTERPRETER; PRINTS ITS TIMINGS AS JSON
+COLD = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[1]).status_code
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported,
+                  'first_request': served - created, 'status': status}))
+'''
+
+
+def cold(path):
+    output = subprocess.run([sys.executable, '-c', COLD, path], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def forked(app, path):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        start = time.perf_counter()
+        status = app.test_client().get(path).status_code
+        result = {'import': 0.0, 'create_app': 0.0,
+                  'first_request': time.perf_counter() - start, 'status': status}
+        os.write(write_fd, json.dumps(result).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        result = json.loads(pipe.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+def report(name, results):
+    columns = ('import', 'create_app', 'first_request')
+    medians = {column: statistics.median(r[column] for r in results) * 1000 for column in columns}
+    statuses = sorted({r['status'] for r in results})
+    print(f'{name:>7}: ' + ', '.join(f'{column} {medians[column]:7.1f} ms' for column in columns)
+          + f', total {sum(medians.values()):7.1f} ms (HTTP {statuses})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--path', default='/', help='URL of the first request.')
+    args = parser.parse_args()
+
+    from app import create_app, init_db  # noqa: E402
+    app = create_app()
+    init_db(app)
+    report('cold', [cold(args.path) for _ in range(args.repeat)])
+    if hasattr(os, 'fork'):
+        report('forked', [forked(app, args.path) for _ in range(args.repeat)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# cache.py
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from flask import current_app
+from markupsafe import Markup
+
+MISS = object()
+
+
+class BaseCache:
+    """Common bookkeeping for the cache backends.
+
+    Backends implement ``_get``, ``_set``, ``_delete_prefix`` and ``__len__``;
+    ``get`` returns :data:`MISS` when a key is absent or expired. ``shared``
+    tells whether every worker process sees the same entries.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries=1000, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.counters = Counter()
+
+    def get(self, key):
+        value = self._get(key)
+        self.counters['hits' if value is not MISS else 'misses'] += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self.counters['sets'] += 1
+        self._set(key, value, time.time() + ttl)
+
+    def delete_prefix(self, *prefixes):
+        """Drop every key starting with any of ``prefixes``."""
+        for prefix in prefixes:
+            self.counters['invalidations'] += self._delete_prefix(prefix)
+
+    def get_or_set(self, key, compute, ttl=None):
+        """Read-through: return the cached value or compute and store it."""
+        value = self.get(key)
+        if value is MISS:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        stats = dict(self.counters, backend=type(self).__name__, size=len(self))
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        stats['hit_rate'] = stats.get('hits', 0) / lookups if lookups else 0.0
+        return stats
+
+
+class NullCache(BaseCache):
+    """Caching switched off: every lookup misses."""
+
+    def _get(self, key):
+        return MISS
+
+    def _set(self, key, value, expires):
+        pass
+
+    def _delete_prefix(self, prefix):
+        return 0
+
+    def __len__(self):
+        return 0
+
+
+class MemoryCache(BaseCache):
+    """In-process LRU cache with per-entry TTL (one copy per worker)."""
+
+    def __init__(self, max_entries=1000, default_ttl=300):
+        super().__init__(max_entries, default_ttl)
+        self._entries = OrderedDict()  # key -> (expires, value), oldest use first
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[0] < time.time():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _set(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def _delete_prefix(self, prefix):
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(BaseCache):
+    """LRU/TTL cache in a SQLite file, shared by every worker process.
+
+    Values are pickled. Each thread keeps its own connection, opened on first
+    use (and again in a forked worker); the file is in WAL mode so readers
+    never wait for a writer.
+    """
+
+    EVICT_EVERY = 100  # sets between LRU sweeps
+    shared = True
+
+    def __init__(self, path, max_entries=1000, default_ttl=300):
+        super().__init__(max_entries, default_ttl)
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        # A CONNECTION INHERITED FROM THE PARENT PROCESS MUST NOT BE USED
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'expires REAL NOT NULL, accessed REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, key):
+        now = time.time()
+        row = self._conn().execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return MISS
+        if row[1] < now:
+            self._conn().execute('DELETE FROM cache WHERE key = ?', (key,))
+            return MISS
+        self._conn().execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0])
+
+    def _set(self, key, value, expires):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                     (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, time.time()))
+        if self.counters['sets'] % self.EVICT_EVERY == 0:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        conn.execute('DELETE FROM cache WHERE expires < ?', (time.time(),))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            conn.execute('DELETE FROM cache WHERE key IN '
+                         '(SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,))
+            self.counters['evictions'] += excess
+
+    def _delete_prefix(self, prefix):
+        # A KEY RANGE, SO THE PRIMARY KEY INDEX IS USED INSTEAD OF LIKE
+        cursor = self._conn().execute('DELETE FROM cache WHERE key >= ? AND key < ?',
+                                      (prefix, prefix + '\uffff'))
+        return cursor.rowcount
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+
+def get_cache():
+    return current_app.extensions['cache']
+
+
+def recipe_key(recipe_id, *validators):
+    """Prefix of every key about a recipe.
+
+    A value built from the row also takes the recipe's ``version``: the key
+    changes with every update, so a worker whose copy was never invalidated
+    (the memory backend is per process) misses rather than serve it.
+    """
+    return f'recipe:{recipe_id}:' + ''.join(f'{part}:' for part in validators)
+
+
+def listing_key(category, *validators):
+    """Prefix of every key about a category; pass its ``ListingValidators`` as for :func:`recipe_key`."""
+    return f'listing:{category}:' + ''.join(f'{part}:' for part in validators)
+
+
+def user_key(user_id):
+    return f'user:{user_id}:'
+
+
+def invalidate_recipe(recipe_id, *categories):
+    """Forget everything cached about a recipe and the listings showing it."""
+    get_cache().delete_prefix(recipe_key(recipe_id),
+                              *[listing_key(category) for category in categories if category])
+
+
+def fragment(key, caller):
+    """Jinja ``{% call fragment(key) %}`` block cached as rendered HTML.
+
+    Use a key under :func:`recipe_key` or :func:`listing_key`, with the
+    validators, so an update changes it and the usual invalidation drops it.
+    """
+    return Markup(get_cache().get_or_set(key, lambda: str(caller())))
+
+
+def create_cache(app):
+    backend = app.config['CACHE_BACKEND']
+    options = dict(max_entries=app.config['CACHE_MAX_ENTRIES'],
+                   default_ttl=app.config['CACHE_DEFAULT_TTL'])
+    if backend == 'memory':
+        return MemoryCache(**options)
+    if backend == 'sqlite':
+        path = app.config.get('CACHE_SQLITE_PATH') or os.path.join(app.instance_path, 'cache.db')
+        return SQLiteCache(path, **options)
+    if backend == 'null':
+        return NullCache(**options)
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r}, expected 'memory', 'sqlite' or 'null'")
+
+
+def init_app(app):
+    app.extensions['cache'] = create_cache(app)
+    app.add_template_global(fragment)
+    app.add_template_global(recipe_key)
@@ -0,0 +1,82 @@
+# conditional.py
+import hashlib
+
+from flask import make_response, request, session
+from flask.sessions import SecureCookieSessionInterface
+from flask_login import current_user
+
+
+def make_etag(*parts):
+    """Strong ETag for a page built from ``parts``.
+
+    The page also shows the navigation for the logged-in user, so their id is
+    always part of the tag.
+    """
+    parts = parts + (current_user.get_id() if current_user.is_authenticated else None,)
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def conditional(etag, last_modified, render):
+    """Answer with 304 if the client's copy is current, otherwise ``render()``.
+
+    ``render`` is only called when the page has changed, so a revalidation
+    costs just the query that produced the validators. Pages about to show
+    flashed messages are always rendered.
+    """
+    response = _validators(etag, last_modified)
+    if response.status_code == 304:
+        return response
+    return _rendered(render(), response)
+
+
+async def conditional_async(etag, last_modified, render):
+    """:func:`conditional` for async views; ``render`` is a coroutine function."""
+    response = _validators(etag, last_modified)
+    if response.status_code == 304:
+        return response
+    return _rendered(await render(), response)
+
+
+def _validators(etag, last_modified):
+    response = make_response('')
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if '_flashes' not in session:
+        response.make_conditional(request)
+    return _private(response)
+
+
+def _rendered(rv, validators):
+    rendered = make_response(rv)
+    rendered.set_etag(validators.get_etag()[0])
+    rendered.last_modified = validators.last_modified
+    return _private(rendered)
+
+
+def _private(response):
+    # PER-USER PAGES: BROWSERS MAY KEEP THEM BUT MUST REVALIDATE EVERY TIME
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+
+class SessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions that are never saved on public, immutable responses.
+
+    Flask-Login reads the session after every request, which would add
+    ``Vary: Cookie`` and keep shared caches from storing images and built
+    assets. Those endpoints never change the session, so they skip saving.
+    """
+
+    public_endpoints = frozenset({'static', 'media.image'})
+
+    def save_session(self, app, session, response):
+        if request.endpoint in self.public_endpoints:
+            return
+        super().save_session(app, session, response)
+
+
+def init_app(app):
+    app.session_interface = SessionInterface()
@@ -0,0 +1,63 @@
+# config.py
+import os
+
+
+class Config:
+    """Default settings; ``create_app(config)`` overrides any of them."""
+
+    SECRET_KEY = 'secret'
+    PASSWORD_HASH_METHOD = 'scrypt'  # Werkzeug method and cost, e.g. 'scrypt:65536:8:1' or 'pbkdf2:sha256:600000'
+    PASSWORD_SALT_LENGTH = 16
+    PASSWORD_WORKERS = 4  # Hashes computed at once per worker process
+    PASSWORD_QUEUE_SIZE = 64  # Logins waiting for a hashing thread before answering 503
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///recipe.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = 10  # Pooled connections per worker process
+    ASYNC_DATABASE_URI = None  # Async driver URL for the ASGI views; SQLite defaults to aiosqlite
+    ASGI_THREADS = 32  # Sync views (and their file I/O) running at once per ASGI worker
+    ASGI_BODY_MEMORY = 1024 * 1024  # Request bodies larger than this are buffered in a temporary file
+    DB_SPLIT_READ_WRITE = False  # Send writes through a separate single-connection engine
+    SQLITE_BUSY_TIMEOUT_MS = 5000  # How long a writer waits for the lock
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the file read through mmap
+    SQLITE_CACHE_SIZE_KB = 64 * 1024  # Page cache per connection
+    UPLOAD_FOLDER = 'static/images'  # Legacy recipe images, served as static files
+    IMAGE_STORE_FOLDER = 'instance/media'  # Content-addressed uploads, served only by /media
+    STATIC_ASSETS = ('main.css', 'images/logo.png', 'images/default.jpg', 'images/mainDish.jpg',
+                     'images/vegetables.jpg', 'images/cocktail.jpg', 'images/dessert.jpg')  # Built by `flask assets build`
+    STATIC_FINGERPRINT = True  # Link the built copies listed in static/build/manifest.json
+    STATIC_SENDFILE = None  # None, 'x-sendfile' or 'x-accel-redirect': the front-end server sends static files
+    STATIC_ACCEL_PREFIX = '/_static/'  # nginx internal location aliased to the static folder
+    LISTING_PAGE_SIZE = 24  # Recipe cards per listing page
+    LISTING_STREAM = False  # Stream listing pages as they render
+    LISTING_AUTHOR_LOADING = 'selectin'  # 'joined', 'selectin' or 'cache'
+    SEARCH_PAGE_SIZE = 20
+    API_MAX_BATCH = 100  # Ids accepted by one GET /api/v1/recipes?ids=
+    API_MAX_PAGE_SIZE = 100  # Largest ?limit= of an API listing
+    API_GZIP_MIN_BYTES = 1024  # Smaller API responses are sent uncompressed (None: never compress)
+    API_GZIP_LEVEL = 6
+    IMAGE_WIDTHS = (160, 480, 960)  # Resized copies made of every upload
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 60 * 60  # Content-addressed images never change
+    IMAGE_MAX_BYTES = 10 * 1024 * 1024  # Largest accepted image upload
+    MAX_CONTENT_LENGTH = IMAGE_MAX_BYTES + 1024 * 1024  # Whole request body
+    JOBS_IN_PROCESS = True  # Run queued jobs on a thread of each web worker; off: `flask jobs worker`
+    JOBS_POLL_INTERVAL = 1.0  # Seconds between looks at the queue when idle
+    JOBS_BATCH_SIZE = 20  # Jobs leased at once
+    JOBS_LEASE_SECONDS = 300  # A job not finished by then is run again by another worker
+    JOBS_MAX_ATTEMPTS = 5  # Then it moves to dead_job
+    JOBS_RETRY_DELAY = 10  # Seconds before the first retry, doubling each time
+    ORPHAN_GRACE_SECONDS = 24 * 60 * 60  # Unreferenced image files younger than this are kept
+    LIKES_BUFFERED = False  # Batch like counter updates in memory
+    LIKES_FLUSH_INTERVAL = 2.0  # Seconds between batched writes
+    RANKING_TOP_N = 100  # Recipes reachable on a category's top and trending views
+    TRENDING_HALF_LIFE_HOURS = 24  # A like counts half as much this much later
+    TRENDING_WINDOW_HOURS = 24 * 14  # Likes older than this drop out at compaction
+    TRENDING_COMPACT_INTERVAL = 24 * 60 * 60  # Seconds between scheduled compactions (`flask rankings schedule`)
+    CACHE_BACKEND = 'memory'  # 'memory' (per worker), 'sqlite' (shared) or 'null'
+    CACHE_MAX_ENTRIES = 5000
+    CACHE_DEFAULT_TTL = 300  # Seconds
+    INSTRUMENTATION = True  # Time SQL/templates/image I/O per request
+    METRICS_TOKEN = None  # Bearer token a scraper must send to /metrics (None: no /metrics)
+    SERVER_TIMING = True  # Send those timings in a Server-Timing header
+    SLOW_QUERY_MS = 100  # Log statements slower than this with their parameters (None: never)
+    USER_CACHE_TTL = 600  # Seconds a logged-in user's identity is reused without a query
+    USER_CACHE_LOCAL_TTL = 10  # The same with a per-worker cache, which other workers cannot invalidate
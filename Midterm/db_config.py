@@ -0,0 +1,169 @@
+# db_config.py
+import os
+import sqlite3
+import weakref
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.dml import UpdateBase
+
+WRITER_BIND = 'writer'
+
+# ENGINES WHOSE POOLS A FORKED CHILD MUST NOT SHARE WITH ITS PARENT
+_engines = weakref.WeakSet()
+
+
+def _is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _is_memory(uri):
+    return make_url(uri).database in (None, '', ':memory:')
+
+
+def engine_options(app, writer=False):
+    """``create_engine`` keyword arguments for the configured database.
+
+    SQLite files get a bounded QueuePool (connections are cheap but the
+    pragmas below are per connection, so they should be reused); an
+    in-memory database has to be one shared connection. A server database
+    gets a pre-pinged, recycled pool. The write engine holds a single
+    connection, so writers in one process queue on the pool instead of
+    spinning on SQLite's busy handler.
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    pool_size = 1 if writer else app.config['DB_POOL_SIZE']
+    if not _is_sqlite(uri):
+        return {'pool_size': pool_size, 'max_overflow': 0 if writer else pool_size,
+                'pool_pre_ping': True, 'pool_recycle': 1800}
+    options = {'connect_args': {'check_same_thread': False,
+                                'timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    if _is_memory(uri):
+        options['poolclass'] = StaticPool
+    else:
+        options.update(pool_size=pool_size, max_overflow=0 if writer else pool_size, pool_timeout=30)
+    return options
+
+
+def sqlite_pragmas(app):
+    return {
+        # READERS NEVER BLOCK THE WRITER (OR EACH OTHER) AND VICE VERSA
+        'journal_mode': 'WAL',
+        # IN WAL MODE THIS ONLY RISKS THE LAST COMMITS ON POWER LOSS, NOT CORRUPTION
+        'synchronous': 'NORMAL',
+        'busy_timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'],
+        'mmap_size': app.config['SQLITE_MMAP_SIZE'],
+        'cache_size': -app.config['SQLITE_CACHE_SIZE_KB'],  # NEGATIVE MEANS KiB, NOT PAGES
+        'temp_store': 'MEMORY',
+    }
+
+
+class RoutingSession(Session):
+    """Session that sends reads and writes to separate engines.
+
+    Reads use the default pool; INSERT/UPDATE/DELETE and ORM flushes use the
+    ``writer`` bind. Once a transaction has written, the rest of it stays on
+    the writer so it reads its own uncommitted changes. Without a ``writer``
+    bind (``DB_SPLIT_READ_WRITE`` off) it behaves like a plain session.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self._writing = False
+        event.listen(self, 'after_transaction_end', self._reset_routing)
+
+    def _reset_routing(self, session, transaction):
+        if transaction.parent is None:
+            self._writing = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and WRITER_BIND in self._db.engines and (self._writing or self._flushing or isinstance(clause, UpdateBase)):
+            self._writing = True
+            return self._db.engines[WRITER_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def configure(app):
+    """Fill in engine options for ``SQLALCHEMY_DATABASE_URI``.
+
+    Call before ``db.init_app(app)``. Switching ``DATABASE_URL`` to a server
+    database needs no code changes: the SQLite-only settings are skipped.
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}).update(engine_options(app))
+    if not app.config['DB_SPLIT_READ_WRITE'] or (_is_sqlite(uri) and _is_memory(uri)):
+        return
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    binds[WRITER_BIND] = dict(engine_options(app, writer=True), url=uri)
+
+
+def init_app(app, db):
+    """Apply the SQLite pragmas to every new connection of ``db``'s engines."""
+    pragmas = sqlite_pragmas(app)
+    with app.app_context():
+        engines = dict(db.engines)
+
+    _engines.update(engines.values())
+    for key, engine in engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        event.listen(engine, 'connect', _pragma_listener(pragmas))
+        if key == WRITER_BIND:
+            # TAKE THE WRITE LOCK AT BEGIN, SO A TRANSACTION CANNOT FAIL HALFWAY
+            # WHEN IT TRIES TO UPGRADE A READ LOCK
+            event.listen(engine, 'connect', _autocommit_driver)
+            event.listen(engine, 'begin', lambda conn: conn.exec_driver_sql('BEGIN IMMEDIATE'))
+
+
+def create_async_engine(app, db):
+    """An asyncio engine on the same database, for the async views (see serving.py).
+
+    SQLite is opened through aiosqlite with the same pool and pragmas as the
+    sync engine; other databases need ASYNC_DATABASE_URI (for example
+    ``postgresql+asyncpg://...``). Call from the process that will use it.
+    """
+    from sqlalchemy.dialects.sqlite.aiosqlite import AsyncAdapt_aiosqlite_connection
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    uri = app.config['ASYNC_DATABASE_URI']
+    if uri is None:
+        with app.app_context():
+            url = db.engine.url  # WITH THE RELATIVE SQLITE PATH ALREADY RESOLVED
+        if url.get_backend_name() != 'sqlite':
+            raise RuntimeError('Set ASYNC_DATABASE_URI to serve async views from this database.')
+        uri = url.set(drivername='sqlite+aiosqlite')
+    engine = create_async_engine(uri, **engine_options(app))
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine.sync_engine, 'connect',
+                     _pragma_listener(sqlite_pragmas(app), AsyncAdapt_aiosqlite_connection))
+    _engines.add(engine.sync_engine)
+    return engine
+
+
+def _pragma_listener(pragmas, connection_type=sqlite3.Connection):
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, connection_type):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+def _autocommit_driver(dbapi_connection, connection_record):
+    # LET SQLALCHEMY, NOT pysqlite, DECIDE WHEN A TRANSACTION BEGINS
+    dbapi_connection.isolation_level = None
+
+
+def _reset_pools_after_fork():
+    # A WORKER FORKED FROM A PRELOADED MASTER STARTS WITH FRESH POOLS; close=False
+    # LEAVES THE PARENT'S CONNECTIONS ALONE INSTEAD OF CLOSING THEM UNDER IT
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
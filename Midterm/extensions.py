@@ -0,0 +1,34 @@
+# extensions.py
+import click
+from flask.cli import ScriptInfo
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+
+from db_config import RoutingSession
+import search_index
+
+# UNBOUND UNTIL create_app() CALLS init_app, SO ANY NUMBER OF APPS CAN SHARE THEM
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+
+
+class MigrateGroup(click.Group):
+    """``flask db``, importing Flask-Migrate (and Alembic) only when it runs.
+
+    Web workers never migrate, so they should not pay for the import.
+    """
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_commands
+
+        app = parent.ensure_object(ScriptInfo).load_app()
+        if 'migrate' not in app.extensions:
+            Migrate().init_app(app, db, command=self.name, include_name=search_index.include_name)
+        # THE REAL GROUP PARSES THE ARGUMENTS AND RUNS
+        return db_commands.make_context(info_name, args, parent=parent, **extra)
+
+
+def init_migrate(app):
+    app.cli.add_command(MigrateGroup('db', help='Perform database migrations.'))
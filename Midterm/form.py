@@ -3,6 +3,9 @@ from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, SelectField
 from wtforms.validators import DataRequired, Email, EqualTo, ValidationError
+from werkzeug.datastructures import FileStorage
+
+from uploads import sniff_image_type, upload_head
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
@@ -41,6 +44,11 @@ class RecipeForm(FlaskForm):
         # Custom validation for instructions field if needed
         pass
 
+    def validate_image(self, image):
+        # Check the file's leading bytes, not just its extension
+        if isinstance(image.data, FileStorage) and sniff_image_type(upload_head(image.data)) is None:
+            raise ValidationError('Images only!')
+
     # def validate(self):
     #     if not super().validate():
     #         return False
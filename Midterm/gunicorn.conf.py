@@ -0,0 +1,37 @@
+# gunicorn.conf.py
+"""Production server settings: ``gunicorn -c gunicorn.conf.py``.
+
+SERVER_MODE picks how each worker process serves requests:
+
+* ``sync`` -- one request at a time per preforked process (wsgi.py)
+* ``gthread`` -- WEB_THREADS requests at a time per process (wsgi.py)
+* ``asgi`` -- an event loop per process under uvicorn (asgi.py); many
+  open connections and slow uploads cost no thread
+
+Settings come from the environment, and the app's own settings from
+FLASK_* variables (e.g. FLASK_CACHE_BACKEND=sqlite).
+"""
+import multiprocessing
+import os
+
+mode = os.environ.get('SERVER_MODE', 'gthread')
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# BUILD THE APP ONCE IN THE MASTER; WORKERS SHARE IT COPY-ON-WRITE (SEE wsgi.py)
+preload_app = True
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = timeout
+keepalive = 5
+
+if mode == 'sync':
+    worker_class = 'sync'
+    wsgi_app = 'wsgi:app'
+elif mode == 'gthread':
+    worker_class = 'gthread'
+    threads = int(os.environ.get('WEB_THREADS', 8))
+    wsgi_app = 'wsgi:app'
+elif mode == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:app'
+else:
+    raise ValueError(f"Unknown SERVER_MODE {mode!r}, expected 'sync', 'gthread' or 'asgi'")
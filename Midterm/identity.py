@@ -0,0 +1,109 @@
+# identity.py
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from cache import MISS, get_cache, user_key
+from db_config import RoutingSession
+from extensions import db
+
+
+class Principal:
+    """The logged-in user as ``current_user`` sees it: id, username and email.
+
+    A plain, picklable stand-in for the ``User`` row, so it can live in the
+    shared cache and be rebuilt without a query. Compares equal to any user
+    object with the same id, so ownership checks work either way.
+    """
+
+    __slots__ = ('id', 'username', 'email')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email)
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        if not hasattr(other, 'get_id'):
+            return NotImplemented
+        return self.get_id() == other.get_id()
+
+    def __hash__(self):
+        return hash(self.get_id())
+
+    def __getstate__(self):
+        return (self.id, self.username, self.email)
+
+    def __setstate__(self, state):
+        self.id, self.username, self.email = state
+
+    def __repr__(self):
+        return f'<Principal {self.id} {self.username!r}>'
+
+
+def load_principal(user_model, user_id):
+    """``user_loader`` body: the cached principal, or one row of three columns.
+
+    Unknown ids are not cached, so a deleted account stays logged out. An
+    update invalidates only this worker's copy when the cache is per worker,
+    so there the principal is kept for the shorter ``USER_CACHE_LOCAL_TTL``.
+    """
+    cache = get_cache()
+    key = user_key(user_id) + 'principal'
+    principal = cache.get(key)
+    if principal is MISS:
+        row = (db.session
+               .query(user_model.id, user_model.username, user_model.email)
+               .filter(user_model.id == user_id)
+               .first())
+        if row is None:
+            return None
+        principal = Principal(*row)
+        ttl = current_app.config['USER_CACHE_TTL' if cache.shared else 'USER_CACHE_LOCAL_TTL']
+        cache.set(key, principal, ttl)
+    return principal
+
+
+def invalidate_user(user_id):
+    get_cache().delete_prefix(user_key(user_id))
+
+
+def _remember_changed_user(mapper, connection, target):
+    # THE SESSION IS NOT PASSED; ITS info DICT OUTLIVES THE FLUSH
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_users', set()).add(target.id)
+
+
+def _invalidate_changed_users(session):
+    # AFTER COMMIT, SO NO OTHER REQUEST CAN CACHE THE OLD ROW AGAIN
+    changed = session.info.pop('changed_users', ())
+    if changed and has_app_context():
+        for user_id in changed:
+            invalidate_user(user_id)
+
+
+def _forget_changed_users(session, previous_transaction):
+    session.info.pop('changed_users', None)
+
+
+def init_app(app, user_model):
+    """Drop a user's cached principal whenever their row is updated or deleted."""
+    listeners = [(user_model, 'after_update', _remember_changed_user),
+                 (user_model, 'after_delete', _remember_changed_user),
+                 (RoutingSession, 'after_commit', _invalidate_changed_users),
+                 (RoutingSession, 'after_soft_rollback', _forget_changed_users)]
+    for target, name, fn in listeners:
+        if not event.contains(target, name, fn):
+            event.listen(target, name, fn)
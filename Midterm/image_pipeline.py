@@ -0,0 +1,162 @@
+# image_pipeline.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+
+import image_store
+
+DERIVED_DIR = 'derived'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+# (pillow format, file extension, save options) FOR EACH DERIVATIVE VARIANT
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', '.webp', {'quality': 75, 'method': 4}),
+}
+
+images_cli = AppGroup('images', help='Manage resized recipe images.')
+
+
+def upload_folder(app=None):
+    app = app or current_app
+    return os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+
+
+def store_folder(app=None):
+    """Folder of the content-addressed store, its upload spool and resized copies.
+
+    Kept out of the static folder, so stored images are only served by
+    ``media.image`` (with immutable caching) and spooled uploads not at all.
+    """
+    app = app or current_app
+    return os.path.join(app.root_path, app.config['IMAGE_STORE_FOLDER'])
+
+
+def folder_of(filename):
+    """The folder a recipe's ``image`` value (or a derivative key) is relative to."""
+    return store_folder() if image_store.is_content_addressed(filename) else upload_folder()
+
+
+def derivative_path(folder, filename, width, fmt):
+    stem, _ = os.path.splitext(filename)
+    return os.path.join(folder, DERIVED_DIR, str(width), stem + FORMATS[fmt][1])
+
+
+def generate_derivatives(folder, filename, widths, force=False):
+    """Write a resized JPEG and WebP of ``filename`` for every width.
+
+    Runs outside of any request, in a job or worker process, so it only
+    takes plain paths. Returns the paths written; does nothing (and returns an
+    empty list) when Pillow is not installed.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return []
+    source = os.path.join(folder, filename)
+    written = []
+    with Image.open(source) as original:
+        # LET THE JPEG DECODER SCALE DOWN WHILE DECODING
+        original.draft('RGB', (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    for width in sorted(widths, reverse=True):
+        if image.width > width:
+            # RESIZE FROM THE PREVIOUS (LARGER) STEP, NOT THE ORIGINAL
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        for fmt, (pil_format, _, options) in FORMATS.items():
+            path = derivative_path(folder, filename, width, fmt)
+            if os.path.exists(path) and not force:
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            image.save(tmp_path, pil_format, **options)
+            os.replace(tmp_path, path)  # NEVER SERVE A HALF-WRITTEN FILE
+            written.append(path)
+    return written
+
+
+def delete_derivatives(folder, filename, widths):
+    for width in widths:
+        for fmt in FORMATS:
+            path = derivative_path(folder, filename, width, fmt)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def file_url(path):
+    """URL of a file under the store or the upload folder.
+
+    Content-addressed files go through the ``media.image`` endpoint, which serves
+    them with immutable caching; anything else is a plain static file.
+    """
+    key = os.path.relpath(path, store_folder()).replace(os.sep, '/')
+    if image_store.is_content_addressed(key):
+        return url_for('media.image', key=key)
+    static_name = os.path.relpath(path, current_app.static_folder).replace(os.sep, '/')
+    return url_for('static', filename=static_name)
+
+
+def image_srcset(filename, fmt='jpeg'):
+    """``srcset`` value listing the derivatives of ``filename`` that exist."""
+    folder = folder_of(filename)
+    candidates = []
+    for width in current_app.config['IMAGE_WIDTHS']:
+        path = derivative_path(folder, filename, width, fmt)
+        if os.path.exists(path):
+            candidates.append(f'{file_url(path)} {width}w')
+    return ', '.join(candidates)
+
+
+def image_url(filename, width=None):
+    """URL of the JPEG derivative closest to ``width``, or of the original."""
+    folder = folder_of(filename)
+    widths = sorted(current_app.config['IMAGE_WIDTHS'])
+    if width is not None:
+        widths = [w for w in widths if w >= width] or widths[-1:]
+        path = derivative_path(folder, filename, widths[0], 'jpeg')
+        if os.path.exists(path):
+            return file_url(path)
+    return file_url(os.path.join(folder, filename))
+
+
+def backfill_derivatives(folder, filenames, widths, workers=None, force=False):
+    """Generate the derivatives of many images on a process pool; returns how many were written."""
+    count = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(generate_derivatives, folder, name, widths, force)
+                   for name in filenames}
+        for name, future in futures.items():
+            try:
+                count += len(future.result())
+            except Exception as e:
+                click.echo(f'Skipped {name}: {e}', err=True)
+    return count
+
+
+@images_cli.command('backfill')
+@click.option('--workers', default=None, type=int, help='Worker processes (default: CPU count).')
+@click.option('--force', is_flag=True, help='Regenerate derivatives that already exist.')
+def backfill_command(workers, force):
+    """Generate derivatives for every image in the upload folder and the store."""
+    folder = upload_folder()
+    widths = tuple(current_app.config['IMAGE_WIDTHS'])
+    filenames = [name for name in os.listdir(folder)
+                 if name.lower().endswith(IMAGE_EXTENSIONS)]
+    count = backfill_derivatives(folder, filenames, widths, workers, force)
+    # PLUS EVERYTHING IN THE CONTENT-ADDRESSED STORE
+    store = store_folder()
+    keys = []
+    for root, _, names in os.walk(os.path.join(store, image_store.STORE_DIR)):
+        keys.extend(key for key in (os.path.relpath(os.path.join(root, name), store).replace(os.sep, '/')
+                                    for name in names)
+                     if image_store.is_content_addressed(key))
+    count += backfill_derivatives(store, keys, widths, workers, force)
+    click.echo(f'Wrote {count} derivatives for {len(filenames) + len(keys)} images.')
+
+
+def init_app(app):
+    app.add_template_global(image_srcset)
+    app.add_template_global(image_url)
+    app.cli.add_command(images_cli)
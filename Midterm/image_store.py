@@ -0,0 +1,170 @@
+# image_store.py
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import abort, current_app, send_from_directory
+from sqlalchemy import update
+from werkzeug.exceptions import RequestEntityTooLarge
+
+STORE_DIR = 'cas'
+CHUNK_SIZE = 64 * 1024
+ONE_YEAR = 365 * 24 * 60 * 60
+
+# cas/ab/cd/<sha256>.<ext>, OPTIONALLY UNDER derived/<width>/
+_KEY_RE = re.compile(r'^(?:derived/(?P<width>\d+)/)?' + STORE_DIR +
+                     r'/[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?P<ext>\.[a-z0-9]+)$')
+
+
+def is_content_addressed(key):
+    return bool(key) and _KEY_RE.match(key) is not None
+
+
+def content_key(digest, ext):
+    """Relative path of a stored image: sharded two levels deep by hash.
+
+    With 256 x 256 shard directories even millions of images leave only a
+    few dozen files in any one directory.
+    """
+    return '/'.join((STORE_DIR, digest[:2], digest[2:4], digest + ext.lower()))
+
+
+def tmp_folder(folder):
+    path = os.path.join(folder, STORE_DIR, 'tmp')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class HashedUpload:
+    """Spool file for an upload that hashes the bytes as they are written.
+
+    Werkzeug's form parser writes each uploaded file to this object chunk by
+    chunk, so by the time the view runs the file is already on disk in the
+    store's temp folder, its SHA-256 is known and :func:`write_image` only has
+    to rename it. Writing more than ``max_size`` bytes aborts the request
+    with 413 straight away instead of after the whole body has arrived.
+    """
+
+    HEAD_SIZE = 32
+
+    def __init__(self, folder, max_size=None):
+        fd, self.name = tempfile.mkstemp(dir=tmp_folder(folder))
+        self._file = os.fdopen(fd, 'w+b')
+        self.sha256 = hashlib.sha256()
+        self.head = b''
+        self.size = 0
+        self.max_size = max_size
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.close()  # THE PARSER NEVER HANDS BACK A FILE IT FAILED ON
+            raise RequestEntityTooLarge()
+        if len(self.head) < self.HEAD_SIZE:
+            self.head = (self.head + data)[:self.HEAD_SIZE]
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        return self._file.flush()
+
+    def close(self):
+        self._file.close()
+        # NOT STORED BY write_image (E.G. THE FORM DID NOT VALIDATE)
+        if os.path.exists(self.name):
+            os.remove(self.name)
+
+
+def write_image(folder, stream, ext):
+    """Hash and store the bytes of ``stream`` under their content key.
+
+    A :class:`HashedUpload` is already hashed and on disk, so it is simply
+    renamed into place. Any other stream is copied in fixed-size chunks to a
+    temporary file next to the store while it is hashed, then renamed. If an
+    identical image is already stored the copy is discarded. Returns
+    ``(key, created)``.
+    """
+    if isinstance(stream, HashedUpload):
+        stream.flush()
+        return _move_into_store(folder, stream.name, stream.sha256.hexdigest(), ext)
+    tmp_dir = tmp_folder(folder)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+        return _move_into_store(folder, tmp_path, digest.hexdigest(), ext)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _move_into_store(folder, tmp_path, digest, ext):
+    key = content_key(digest, ext)
+    path = os.path.join(folder, key)
+    if os.path.exists(path):
+        return key, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return key, True
+
+
+def acquire(model, key):
+    """Record one more recipe using ``key``."""
+    session = current_app.extensions['sqlalchemy'].session
+    result = session.execute(update(model).where(model.key == key)
+                             .values(refcount=model.refcount + 1))
+    if result.rowcount == 0:
+        session.add(model(key=key, refcount=1))
+        session.flush()
+
+
+def release(model, key):
+    """Record one less recipe using ``key``.
+
+    Returns True when this was the last reference, i.e. when the caller
+    should delete the file. A key with no reference count was never stored
+    here, so it is never reported as deletable.
+    """
+    session = current_app.extensions['sqlalchemy'].session
+    session.execute(update(model).where(model.key == key)
+                    .values(refcount=model.refcount - 1))
+    ref = session.get(model, key, populate_existing=True)
+    if ref is None:
+        return False
+    if ref.refcount <= 0:
+        session.delete(ref)
+        return True
+    return False
+
+
+def send_image(folder, key):
+    """Serve a content-addressed file with immutable, far-future caching.
+
+    The URL changes whenever the bytes do, so clients may keep the file
+    forever; the strong ETag is the content hash (plus the variant for
+    resized copies).
+    """
+    match = _KEY_RE.match(key)
+    if match is None:
+        abort(404)
+    etag = match.group('digest')
+    if match.group('width'):
+        etag += '-' + match.group('width') + match.group('ext')
+    response = send_from_directory(folder, key, etag=etag,
+                                   max_age=current_app.config.get('IMAGE_CACHE_MAX_AGE', ONE_YEAR))
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
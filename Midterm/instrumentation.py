@@ -0,0 +1,234 @@
+# instrumentation.py
+import hmac
+import json
+import logging
+import reprlib
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import abort, before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Collects the SQL statements executed while it is active."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the SQL statements ``engine`` executes inside the ``with`` block.
+
+    Used to pin the number of queries a route makes, e.g.::
+
+        with count_queries(db.engine) as queries:
+            client.get('/dessert')
+        assert queries.count <= 3, queries.statements
+    """
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+# ---- Per-request timings, slow query log, Server-Timing and /metrics ----
+
+logger = logging.getLogger('instrumentation')
+
+# SECONDS; PROMETHEUS' OWN DEFAULT BUCKETS
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Server-Timing METRIC NAMES AND DESCRIPTIONS, IN HEADER ORDER
+PHASES = {'db': 'SQL', 'tpl': 'Templates', 'img': 'Image I/O'}
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label tuple."""
+
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, labels))
+            prefix = label_text + ',' if label_text else ''
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-2]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {values[-2]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {values[-1]}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """The histograms of one app (one worker process)."""
+
+    def __init__(self):
+        labels = ('endpoint', 'method', 'status')
+        self.histograms = [
+            Histogram('http_request_duration_seconds', 'Time to build the response.', labels),
+            Histogram('http_request_db_seconds', 'Time spent in SQL per request.', labels),
+            Histogram('http_request_template_seconds', 'Time spent rendering templates per request.', labels),
+            Histogram('http_request_queries', 'SQL statements per request.', labels,
+                      buckets=(1, 2, 3, 5, 10, 20, 50, 100)),
+        ]
+
+    def observe(self, labels, total, timings):
+        duration, db_time, template_time, queries = self.histograms
+        duration.observe(total, *labels)
+        db_time.observe(timings['db'][1], *labels)
+        template_time.observe(timings['tpl'][1], *labels)
+        queries.observe(timings['db'][0], *labels)
+
+    def expose(self):
+        return '\n'.join(histogram.expose() for histogram in self.histograms) + '\n'
+
+
+def _timings():
+    """This request's ``{phase: [count, seconds]}``, or None outside a request."""
+    if not has_request_context():
+        return None
+    return g.setdefault('_timings', {phase: [0, 0.0] for phase in PHASES})
+
+
+def record(phase, seconds):
+    timings = _timings()
+    if timings is not None:
+        timings[phase][0] += 1
+        timings[phase][1] += seconds
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the ``with`` block to ``phase`` of this request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # KEPT ON THE STATEMENT'S OWN CONTEXT, SO A STATEMENT THAT FAILS LEAVES NOTHING BEHIND
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _query_timer(slow_query_seconds):
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_query_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        record('db', duration)
+        if slow_query_seconds is not None and duration >= slow_query_seconds:
+            logger.warning(json.dumps({
+                'event': 'slow_query',
+                'duration_ms': round(duration * 1000, 2),
+                'endpoint': request.endpoint if has_request_context() else None,
+                'statement': statement,
+                # executemany BATCHES CAN BE HUGE
+                'parameters': reprlib.repr(parameters),
+            }))
+    return after_cursor_execute
+
+
+def _before_render_template(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault('_render_start', []).append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    starts = g.get('_render_start') if has_request_context() else None
+    if starts:
+        record('tpl', time.perf_counter() - starts.pop())
+
+
+def _start_request():
+    g._request_start = time.perf_counter()
+
+
+def _finish_request(response):
+    start = g.pop('_request_start', None)
+    if start is None:
+        return response
+    total = time.perf_counter() - start
+    timings = _timings()
+    config = current_app.config
+    if config['SERVER_TIMING']:
+        # SHOWN IN THE BROWSER'S NETWORK PANEL, PER PHASE
+        entries = [f'{phase};dur={seconds * 1000:.1f};desc="{PHASES[phase]} ({count})"'
+                   for phase, (count, seconds) in timings.items() if count]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(entries)
+    labels = (request.endpoint or 'none', request.method, str(response.status_code))
+    current_app.extensions['metrics'].observe(labels, total, timings)
+    return response
+
+
+def metrics():
+    """Prometheus text format; each worker process reports its own requests."""
+    expected = f"Bearer {current_app.config['METRICS_TOKEN']}"
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode()):
+        abort(404)  # AS IF THERE WERE NO SUCH PAGE
+    return current_app.response_class(current_app.extensions['metrics'].expose(),
+                                      mimetype='text/plain; version=0.0.4')
+
+
+def instrument_engine(app, engine):
+    """Time the statements of ``engine``; for engines made after :func:`init_app`."""
+    if not app.config['INSTRUMENTATION']:
+        return
+    slow_query = app.config['SLOW_QUERY_MS']
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _query_timer(None if slow_query is None else slow_query / 1000))
+
+
+def init_app(app, db):
+    """Time SQL, templates and whole requests, and serve ``/metrics`` if METRICS_TOKEN is set."""
+    if not app.config['INSTRUMENTATION']:
+        return
+    app.extensions['metrics'] = Metrics()
+    with app.app_context():
+        engines = dict(db.engines)
+    for engine in engines.values():
+        instrument_engine(app, engine)
+    # CONNECTED RECEIVERS ARE WEAK REFERENCES; MODULE FUNCTIONS STAY ALIVE
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    if app.config['METRICS_TOKEN']:
+        app.add_url_rule('/metrics', 'metrics', metrics)
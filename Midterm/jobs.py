@@ -0,0 +1,214 @@
+# jobs.py
+import os
+import threading
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, or_, select, update
+
+from db_config import RoutingSession
+from extensions import db
+from models import DeadJob, Job
+
+TASKS = {}  # name -> function(**payload)
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+_wakeup = threading.Event()
+_lock = threading.Lock()
+_worker = None
+
+
+def task(name):
+    """Register a function as the job ``name``; it is called with the payload as keywords."""
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+
+def enqueue(name, delay=None, **payload):
+    """Queue job ``name`` in the current transaction, to run ``delay`` seconds from now.
+
+    The job row is written with the request's own changes, so it runs only
+    if they commit (and is never lost if they do). Payloads must be JSON.
+    """
+    if name not in TASKS:
+        raise KeyError(f'Unknown job {name!r}')
+    session = db.session
+    job = Job(name=name, payload=payload)
+    if delay:
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+    session.add(job)
+    session.info['jobs_enqueued'] = True
+    if current_app.config['JOBS_IN_PROCESS']:
+        _start_worker(current_app._get_current_object())
+
+
+def _claim(now, limit, lease):
+    """Lease up to ``limit`` due jobs to this worker; returns their ids.
+
+    The conditional UPDATE is atomic, so two workers (threads or processes)
+    can never both take the same job.
+    """
+    due = db.session.scalars(
+        select(Job.id)
+        .where(Job.run_after <= now, or_(Job.locked_until.is_(None), Job.locked_until < now))
+        .order_by(Job.id).limit(limit)).all()
+    claimed = []
+    for job_id in due:
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, or_(Job.locked_until.is_(None), Job.locked_until < now))
+            .values(locked_until=now + lease))
+        if result.rowcount:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+
+def _run(job):
+    job_id = job.id
+    try:
+        TASKS[job.name](**job.payload)
+    except Exception as e:
+        db.session.rollback()
+        _failed(job_id, f'{type(e).__name__}: {e}')
+        return False
+    db.session.execute(delete(Job).where(Job.id == job_id))
+    db.session.commit()
+    return True
+
+
+def _failed(job_id, error):
+    """Retry with exponential backoff, or move to ``dead_job`` after JOBS_MAX_ATTEMPTS."""
+    config = current_app.config
+    job = db.session.get(Job, job_id)
+    job.attempts += 1
+    if job.attempts >= config['JOBS_MAX_ATTEMPTS'] or job.name not in TASKS:
+        db.session.add(DeadJob(name=job.name, payload=job.payload, attempts=job.attempts,
+                               error=error, created_at=job.created_at))
+        db.session.delete(job)
+        current_app.logger.error(f'Job {job.id} ({job.name}) failed for good: {error}')
+    else:
+        delay = config['JOBS_RETRY_DELAY'] * 2 ** (job.attempts - 1)
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        job.locked_until = None
+        job.error = error
+    db.session.commit()
+
+
+def run_pending(limit=None):
+    """Run the jobs that are due now; returns (succeeded, failed)."""
+    config = current_app.config
+    limit = limit or config['JOBS_BATCH_SIZE']
+    now = datetime.utcnow()
+    succeeded = failed = 0
+    for job_id in _claim(now, limit, timedelta(seconds=config['JOBS_LEASE_SECONDS'])):
+        job = db.session.get(Job, job_id)
+        if job.name not in TASKS:
+            _failed(job.id, f'Unknown job {job.name!r}')
+            failed += 1
+        elif _run(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def work(app, stop=None):
+    """Run jobs until ``stop`` is set, sleeping JOBS_POLL_INTERVAL when idle."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                succeeded, failed = run_pending()
+            except Exception as e:
+                app.logger.error(f'Could not run jobs: {e}')
+                succeeded = failed = 0
+        if not succeeded and not failed:
+            # A COMMIT THAT QUEUED A JOB WAKES US EARLY
+            _wakeup.wait(app.config['JOBS_POLL_INTERVAL'])
+            _wakeup.clear()
+
+
+def _start_worker(app):
+    global _worker
+    with _lock:
+        if _worker is not None:
+            return
+        _worker = threading.Thread(target=work, args=(app,), name='jobs-worker', daemon=True)
+        _worker.start()
+
+
+def _reset_after_fork():
+    # THE THREAD STAYED IN THE PARENT; A FORKED WORKER STARTS ITS OWN
+    global _worker
+    _worker = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _wake_after_commit(session):
+    if session.info.pop('jobs_enqueued', False):
+        _wakeup.set()
+
+
+def _forget_enqueued(session, previous_transaction):
+    session.info.pop('jobs_enqueued', None)
+
+
+@jobs_cli.command('worker')
+@click.option('--once', is_flag=True, help='Run the jobs due now, then exit.')
+def worker_command(once):
+    """Run queued jobs (use with JOBS_IN_PROCESS off)."""
+    if once:
+        succeeded, failed = run_pending()
+        while succeeded or failed:
+            click.echo(f'{succeeded} done, {failed} failed')
+            succeeded, failed = run_pending()
+        return
+    click.echo('Running jobs; Ctrl+C to stop.')
+    try:
+        work(current_app._get_current_object())
+    except KeyboardInterrupt:
+        pass
+
+
+@jobs_cli.command('status')
+def status_command():
+    """Show queued and dead jobs."""
+    for job in db.session.scalars(select(Job).order_by(Job.id)):
+        click.echo(f'queued {job.id:>6} {job.name:<20} attempts={job.attempts} '
+                   f'run_after={job.run_after:%Y-%m-%d %H:%M:%S} {job.error or ""}')
+    for job in db.session.scalars(select(DeadJob).order_by(DeadJob.id)):
+        click.echo(f'dead   {job.id:>6} {job.name:<20} attempts={job.attempts} {job.error}')
+
+
+@jobs_cli.command('retry')
+@click.argument('job_ids', nargs=-1, type=int)
+def retry_command(job_ids):
+    """Queue dead jobs again (all of them without JOB_IDS)."""
+    query = select(DeadJob)
+    if job_ids:
+        query = query.where(DeadJob.id.in_(job_ids))
+    count = 0
+    for dead in db.session.scalars(query).all():
+        db.session.add(Job(name=dead.name, payload=dead.payload))
+        db.session.delete(dead)
+        count += 1
+    db.session.commit()
+    click.echo(f'Requeued {count} jobs.')
+
+
+def init_app(app):
+    app.cli.add_command(jobs_cli)
+    listeners = [(RoutingSession, 'after_commit', _wake_after_commit),
+                 (RoutingSession, 'after_soft_rollback', _forget_enqueued)]
+    for target, name, fn in listeners:
+        if not event.contains(target, name, fn):
+            event.listen(target, name, fn)
@@ -0,0 +1,138 @@
+# likes.py
+import atexit
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+import cache
+import rankings
+
+_lock = threading.Lock()
+_pending = Counter()  # recipe_id -> likes not yet written (LIKES_BUFFERED)
+_pending_at = defaultdict(list)  # recipe_id -> when those likes happened, for trending
+_flusher = None
+
+# INSERT ... ON CONFLICT DO NOTHING, WHERE THE DATABASE HAS IT
+_INSERT_IGNORE = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def _insert_like(session, like_model, **values):
+    """INSERT a like unless the user already liked the recipe; returns whether it did."""
+    insert_ignore = _INSERT_IGNORE.get(session.get_bind().dialect.name)
+    if insert_ignore is None:
+        try:
+            session.execute(insert(like_model).values(**values))
+        except IntegrityError:
+            return False
+        return True
+    return session.execute(insert_ignore(like_model).values(**values).on_conflict_do_nothing()).rowcount == 1
+
+
+def like_recipe(recipe_model, like_model, user_id, recipe_id):
+    """Record that ``user_id`` likes ``recipe_id``; commits the session.
+
+    The (user_id, recipe_id) primary key on ``like_model`` rejects a second
+    like by the same user with one index lookup. The counter itself is bumped
+    with ``UPDATE ... SET likes = likes + 1`` so concurrent likes can never
+    overwrite each other, or, with ``LIKES_BUFFERED``, added to an in-memory
+    tally that a background thread writes out in batches. The trending score
+    moves in the same UPDATE. The like row and the counter commit together
+    or not at all. Returns False if the user had already liked the recipe.
+    """
+    session = current_app.extensions['sqlalchemy'].session
+    now = datetime.utcnow()
+    try:
+        if not _insert_like(session, like_model, user_id=user_id, recipe_id=recipe_id, liked_at=now):
+            session.rollback()
+            return False
+        if not current_app.config['LIKES_BUFFERED']:
+            session.execute(update(recipe_model)
+                            .where(recipe_model.id == recipe_id)
+                            .values(likes=func.coalesce(recipe_model.likes, 0) + 1,
+                                    trending=recipe_model.trending + rankings.trending_increment(session, [now])))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    if current_app.config['LIKES_BUFFERED']:
+        with _lock:
+            _pending[recipe_id] += 1
+            _pending_at[recipe_id].append(now)
+        _start_flusher(current_app._get_current_object(), recipe_model)
+    return True
+
+
+def pending_likes(recipe_id):
+    """Likes for ``recipe_id`` that are buffered but not yet in the database."""
+    with _lock:
+        return _pending.get(recipe_id, 0)
+
+
+def flush_likes(recipe_model):
+    """Write all buffered likes in one transaction and drop their cached pages; returns how many."""
+    with _lock:
+        batch = dict(_pending)
+        batch_at = dict(_pending_at)
+        _pending.clear()
+        _pending_at.clear()
+    if not batch:
+        return 0
+    db = current_app.extensions['sqlalchemy']
+    table = recipe_model.__table__
+    statement = (table.update()
+                 .where(table.c.id == bindparam('recipe_id'))
+                 .values(likes=func.coalesce(table.c.likes, 0) + bindparam('delta'),
+                         trending=table.c.trending + bindparam('score')))
+    try:
+        with db.engine.begin() as connection:
+            # WEIGHED AGAINST THE EPOCH IN THIS TRANSACTION, SO A COMPACTION CANNOT SLIP BETWEEN
+            epoch = rankings.get_epoch(connection)
+            # ONE executemany FOR THE WHOLE BATCH
+            connection.execute(statement, [
+                {'recipe_id': recipe_id, 'delta': delta,
+                 'score': sum(rankings.like_weight(moment, epoch) for moment in batch_at.get(recipe_id, ()))}
+                for recipe_id, delta in batch.items()])
+            categories = connection.execute(select(table.c.id, table.c.category)
+                                            .where(table.c.id.in_(list(batch)))).all()
+    except Exception:
+        # PUT THE BATCH BACK SO THE NEXT FLUSH RETRIES IT
+        with _lock:
+            _pending.update(batch)
+            for recipe_id, moments in batch_at.items():
+                _pending_at[recipe_id].extend(moments)
+        raise
+    # THE CACHED COUNTS LEFT OUT THE BUFFERED LIKES, WHICH ARE NO LONGER ADDED ON TOP
+    for recipe_id, category in categories:
+        cache.invalidate_recipe(recipe_id, category)
+    return sum(batch.values())
+
+
+def _start_flusher(app, recipe_model):
+    global _flusher
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_flush_loop, args=(app, recipe_model),
+                                    name='likes-flusher', daemon=True)
+        _flusher.start()
+    atexit.register(_flush_at_exit, app, recipe_model)
+
+
+def _flush_loop(app, recipe_model):
+    stop = threading.Event()
+    while not stop.wait(app.config['LIKES_FLUSH_INTERVAL']):
+        with app.app_context():
+            try:
+                flush_likes(recipe_model)
+            except Exception as e:
+                app.logger.error(f'Could not flush likes: {e}')
+
+
+def _flush_at_exit(app, recipe_model):
+    with app.app_context():
+        flush_likes(recipe_model)
@@ -0,0 +1,154 @@
+# listing.py
+from collections import namedtuple
+
+from flask import current_app, g, render_template, request, stream_template
+from sqlalchemy import desc, func
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from cache import get_cache, listing_key
+from conditional import conditional, make_etag
+
+# COLUMNS THE RECIPE CARD TEMPLATES ACTUALLY RENDER
+CARD_COLUMNS = ('id', 'title', 'description', 'image', 'likes', 'user_id')
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'per_page'])
+# PLAIN, PICKLABLE COPIES OF A CARD'S DATA, FOR THE CACHE
+Author = namedtuple('Author', ['username'])
+Card = namedtuple('Card', CARD_COLUMNS + ('user',))
+RecipeDetail = namedtuple('RecipeDetail', CARD_COLUMNS + ('ingredient_lines', 'instruction_steps', 'category'))
+ListingValidators = namedtuple('ListingValidators', ['count', 'version_sum', 'max_id', 'last_modified'])
+
+# WAYS OF LOADING recipe.user FOR A PAGE OF CARDS (LISTING_AUTHOR_LOADING)
+AUTHOR_LOADERS = ('joined', 'selectin', 'cache')
+
+
+def _author_model(model):
+    return model.user.property.mapper.class_
+
+
+def _author_options(model):
+    strategy = current_app.config['LISTING_AUTHOR_LOADING']
+    if strategy not in AUTHOR_LOADERS:
+        raise ValueError(f'Unknown LISTING_AUTHOR_LOADING {strategy!r}, expected one of {AUTHOR_LOADERS}')
+    author = _author_model(model)
+    if strategy == 'joined':
+        # ONE QUERY: THE AUTHOR ROW IS JOINED ONTO EVERY RECIPE ROW
+        return [joinedload(model.user).load_only(author.username)]
+    if strategy == 'selectin':
+        # TWO QUERIES: THE PAGE, THEN ONE "WHERE user.id IN (...)" FOR ITS AUTHORS
+        return [selectinload(model.user).load_only(author.username)]
+    # 'cache' IS FILLED IN BY attach_authors() AFTER THE PAGE IS FETCHED
+    return []
+
+
+def attach_authors(model, recipes):
+    """Set ``recipe.user`` on each recipe from a per-request author cache.
+
+    The cache lives on ``flask.g`` and is keyed by ``user_id``; authors that
+    are not cached yet are fetched in a single ``IN`` query, so a page costs at
+    most one extra query however many cards it has.
+    """
+    author = _author_model(model)
+    cache = g.setdefault('author_cache', {})
+    missing = {recipe.user_id for recipe in recipes} - cache.keys()
+    if missing:
+        users = (author.query
+                 .options(load_only(author.id, author.username))
+                 .filter(author.id.in_(missing))
+                 .all())
+        cache.update((user.id, user) for user in users)
+    for recipe in recipes:
+        # POPULATE THE RELATIONSHIP WITHOUT MARKING THE RECIPE AS CHANGED
+        set_committed_value(recipe, 'user', cache.get(recipe.user_id))
+    return recipes
+
+
+def card_query(model, category):
+    """Query for the recipe cards of one category, newest first.
+
+    Only the card columns are selected, so the large ``ingredients`` and
+    ``instructions`` text columns never leave the database, and each card's
+    author is loaded by the ``LISTING_AUTHOR_LOADING`` strategy instead of one
+    lazy query per card.
+    """
+    columns = [getattr(model, name) for name in CARD_COLUMNS]
+    return (model.query
+            .options(load_only(*columns), *_author_options(model))
+            .filter(model.category == category)
+            .order_by(desc(model.id)))
+
+
+def keyset_page(query, model, after=None, per_page=None):
+    """Fetch one page of ``query`` using ``model.id`` as the cursor.
+
+    ``after`` is the id of the last recipe on the previous page. Instead of
+    an OFFSET (which makes the database walk every skipped row) the next page
+    starts with ``id < after``, which is a single index seek however deep the
+    reader has paged.
+    """
+    if per_page is None:
+        per_page = current_app.config['LISTING_PAGE_SIZE']
+    if after is not None:
+        query = query.filter(model.id < after)
+    # FETCH ONE EXTRA ROW TO KNOW WHETHER ANOTHER PAGE EXISTS
+    rows = query.limit(per_page + 1).all()
+    next_cursor = rows[per_page - 1].id if len(rows) > per_page else None
+    items = rows[:per_page]
+    if current_app.config['LISTING_AUTHOR_LOADING'] == 'cache':
+        attach_authors(model, items)
+    return Page(items=items, next_cursor=next_cursor, per_page=per_page)
+
+
+def to_cards(recipes):
+    return [Card(*(getattr(recipe, name) for name in CARD_COLUMNS),
+                 user=Author(recipe.user.username) if recipe.user else None)
+            for recipe in recipes]
+
+
+def detail_query(model):
+    """Query for a recipe page: its pre-split lines, never the raw text columns."""
+    return model.query.options(load_only(*[getattr(model, name) for name in RecipeDetail._fields]))
+
+
+def recipe_detail(recipe):
+    return RecipeDetail(*(getattr(recipe, name) for name in RecipeDetail._fields))
+
+
+def listing_validators(model, category):
+    """:class:`ListingValidators` of a category in one aggregate; all go into the ETag.
+
+    Every update bumps a recipe's ``version``. Adding one recipe and deleting
+    another can leave the count and the version sum as they were, but not the
+    newest ``id`` and ``updated_at`` as well.
+    """
+    return ListingValidators(*model.query
+                             .with_entities(func.count(model.id), func.sum(model.version),
+                                            func.max(model.id), func.max(model.updated_at))
+                             .filter(model.category == category)
+                             .one())
+
+
+def render_listing(template, model, category, **context):
+    """Render a paginated card listing of ``category``.
+
+    A client that already has the current page gets a 304 decided by
+    :func:`listing_validators` alone. Otherwise each page of cards is read
+    through the cache, and the page is streamed if ``LISTING_STREAM`` is set.
+    """
+    after = request.args.get('after', type=int)
+    validators = listing_validators(model, category)
+
+    def render():
+        def fetch():
+            page = keyset_page(card_query(model, category), model, after=after)
+            return page._replace(items=to_cards(page.items))
+        page = get_cache().get_or_set(f'{listing_key(category, *validators)}after={after}', fetch)
+        context.update(recipes=page.items, page=page)
+        if current_app.config['LISTING_STREAM']:
+            # SEND THE HEADER AND FIRST CARDS BEFORE THE WHOLE PAGE HAS RENDERED
+            return current_app.response_class(stream_template(template, **context))
+        return render_template(template, **context)
+
+    etag = make_etag(template, category, after, *validators)
+    return conditional(etag, validators.last_modified, render)
@@ -0,0 +1,131 @@
+# media.py
+import os
+import time
+
+import click
+from flask import Blueprint, current_app, flash, redirect, request
+from sqlalchemy import select
+from werkzeug.datastructures import FileStorage
+
+import image_pipeline
+import image_store
+import instrumentation
+import jobs
+import uploads
+from extensions import db
+from models import ImageRef, Recipe
+
+bp = Blueprint('media', __name__)
+
+
+def save_image(image):
+    if image and isinstance(image, FileStorage):  # Check if image is not None and is a FileStorage object
+        # STORE UNDER THE EXTENSION OF THE ACTUAL FILE TYPE, NOT THE UPLOADED NAME
+        f_ext = uploads.sniff_image_type(uploads.upload_head(image))
+        if f_ext is None:
+            return None
+        # NAME THE IMAGE BY THE HASH OF ITS BYTES; IDENTICAL UPLOADS SHARE ONE FILE
+        with instrumentation.timed('img'):
+            image_key, created = image_store.write_image(image_pipeline.store_folder(), image.stream, f_ext)
+        image_store.acquire(ImageRef, image_key)
+        if created:
+            # RESIZED AND WEBP COPIES ARE MADE BY A JOB ONCE THE RECIPE IS COMMITTED
+            jobs.enqueue('image.derivatives', key=image_key)
+        return image_key
+    return None
+
+
+
+def delete_image(filename):
+    # LEGACY FILE NAMES ARE LEFT ALONE: THEY MAY BE SITE IMAGES (e.g. dessert.jpg)
+    if not image_store.is_content_addressed(filename):
+        return
+    # STORED IMAGES ARE SHARED; ONLY THE LAST RECIPE USING ONE DELETES IT
+    if not image_store.release(ImageRef, filename):
+        return
+    # DELETE THE IMAGE FILE (AFTER COMMIT, BY A JOB)
+    jobs.enqueue('image.delete', key=filename)
+
+
+def _in_use(key):
+    # RE-UPLOADED (OR STILL USED BY A RECIPE) SINCE THE JOB WAS QUEUED
+    if db.session.get(ImageRef, key) is not None:
+        return True
+    return db.session.query(Recipe.id).filter_by(image=key).first() is not None
+
+
+@jobs.task('image.derivatives')
+def generate_derivatives_job(key):
+    folder = image_pipeline.store_folder()
+    if os.path.exists(os.path.join(folder, key)):  # Not deleted in the meantime
+        image_pipeline.generate_derivatives(folder, key, tuple(current_app.config['IMAGE_WIDTHS']))
+
+
+@jobs.task('image.delete')
+def delete_image_job(key):
+    # JOBS QUEUED BEFORE LEGACY FILES WERE EXEMPT MAY STILL NAME ONE
+    if not image_store.is_content_addressed(key) or _in_use(key):
+        return
+    folder = image_pipeline.store_folder()
+    image_path = os.path.join(folder, key)
+    if os.path.exists(image_path):
+        os.remove(image_path)
+    image_pipeline.delete_derivatives(folder, key, current_app.config['IMAGE_WIDTHS'])
+
+
+@jobs.task('image.sweep')
+def sweep_orphans(grace_seconds=None):
+    """Delete stored images (and resized copies) that nothing references.
+
+    Covers files left by requests that rolled back after storing an upload,
+    abandoned upload temp files and derivatives whose original is gone.
+    Only files older than ``ORPHAN_GRACE_SECONDS`` are touched, so an upload
+    whose recipe is still being saved is safe. Returns how many were removed.
+    """
+    if grace_seconds is None:
+        grace_seconds = current_app.config['ORPHAN_GRACE_SECONDS']
+    folder = image_pipeline.store_folder()
+    cutoff = time.time() - grace_seconds
+    referenced = set(db.session.scalars(select(ImageRef.key)))
+    referenced.update(db.session.scalars(select(Recipe.image).where(Recipe.image.is_not(None)).distinct()))
+    removed = 0
+
+    def old_files(top):
+        for root, _, names in os.walk(os.path.join(folder, top)):
+            for name in names:
+                path = os.path.join(root, name)
+                if os.path.getmtime(path) < cutoff:
+                    yield path, os.path.relpath(path, folder).replace(os.sep, '/')
+
+    for path, key in old_files(image_store.STORE_DIR):
+        abandoned_upload = key.startswith(image_store.STORE_DIR + '/tmp/')
+        if abandoned_upload or (image_store.is_content_addressed(key) and key not in referenced):
+            os.remove(path)
+            removed += 1
+    for path, key in old_files(image_pipeline.DERIVED_DIR):
+        # derived/<width>/cas/ab/cd/<digest>.<ext>: KEEP WHILE ANY ORIGINAL WITH THAT DIGEST EXISTS
+        source_stem = os.path.splitext(os.path.join(folder, *key.split('/')[2:]))[0]
+        if not any(os.path.exists(source_stem + ext) for ext in image_pipeline.IMAGE_EXTENSIONS):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+@image_pipeline.images_cli.command('sweep')
+@click.option('--grace', type=int, default=None, help='Keep files younger than this many seconds.')
+def sweep_command(grace):
+    """Delete image files no recipe references."""
+    click.echo(f'Removed {sweep_orphans(grace)} orphaned files.')
+
+
+# Upload larger than IMAGE_MAX_BYTES / MAX_CONTENT_LENGTH
+@bp.app_errorhandler(413)
+def upload_too_large(error):
+    flash(f"Images can be at most {current_app.config['IMAGE_MAX_BYTES'] // (1024 * 1024)} MB.", 'error')
+    return redirect(request.url)
+
+
+# Content-addressed images, cached by browsers and CDNs for good
+@bp.route('/media/<path:key>')
+def image(key):
+    return image_store.send_image(image_pipeline.store_folder(), key)
@@ -0,0 +1,50 @@
+"""Added trending score, ranking indexes and ranking_state
+
+Revision ID: 6e1c9d4b2f58
+Revises: 0b4e8f3a9c17
+Create Date: 2026-10-17 22:10:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1c9d4b2f58'
+down_revision = '0b4e8f3a9c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    ranking_state = op.create_table('ranking_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('epoch', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(ranking_state, [
+        {'id': 1, 'epoch': datetime.utcnow().replace(minute=0, second=0, microsecond=0)}])
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('trending', sa.Float(), server_default='0', nullable=False))
+        batch_op.create_index('ix_recipe_category_likes', ['category', 'likes'], unique=False)
+        batch_op.create_index('ix_recipe_category_trending', ['category', 'trending'], unique=False)
+
+    # Earlier likes have no time, so they count for the top view but not for trending
+    with op.batch_alter_table('recipe_like', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('liked_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_recipe_like_liked_at'), ['liked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe_like', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recipe_like_liked_at'))
+        batch_op.drop_column('liked_at')
+
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipe_category_trending')
+        batch_op.drop_index('ix_recipe_category_likes')
+        batch_op.drop_column('trending')
+
+    op.drop_table('ranking_state')
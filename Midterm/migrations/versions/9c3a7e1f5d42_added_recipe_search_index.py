@@ -0,0 +1,33 @@
+"""Added recipe full-text search index
+
+Revision ID: 9c3a7e1f5d42
+Revises: 6e1c9d4b2f58
+Create Date: 2026-10-17 23:40:00.000000
+
+"""
+from alembic import op
+
+import search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3a7e1f5d42'
+down_revision = '6e1c9d4b2f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite only; elsewhere search falls back to a title scan
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    # Batch migrations of recipe copy the table and lose its triggers, so
+    # this recreates them and re-reads every recipe into the index
+    search_index.rebuild_search_index(op.get_bind())
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    search_index.drop_search_triggers(op.get_bind())
+    op.execute(f'DROP TABLE IF EXISTS {search_index.FTS_TABLE}')
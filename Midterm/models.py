@@ -0,0 +1,115 @@
+# models.py
+from datetime import datetime
+
+from flask_login import UserMixin
+from sqlalchemy.orm import validates
+
+from extensions import db
+import passwords
+import recipe_text
+
+
+# Define database models
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(100), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)  # scrypt hashes are 160+ characters
+
+    def set_password(self, password):
+        self.password_hash = passwords.hash_password(password)
+
+    def check_password(self, password):
+        return passwords.verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return passwords.needs_rehash(self.password_hash)
+
+class Recipe(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    ingredients = db.Column(db.Text, nullable=False)
+    instructions = db.Column(db.Text, nullable=False)
+    image = db.Column(db.String(255), nullable=True)
+    likes = db.Column(db.Integer, default=0)  # New field to store the number of likes
+    category = db.Column(db.String(100), nullable=True)  # Add the category column
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User', backref='recipes', lazy=True)
+    # Bumped on every UPDATE (ORM or Core), for ETag/Last-Modified validators
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=db.literal_column('version + 1'))
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # ingredients/instructions split into lines once, when they are written
+    ingredient_lines = db.Column(db.JSON, nullable=True)
+    instruction_steps = db.Column(db.JSON, nullable=True)
+    ingredient_terms = db.relationship('RecipeIngredient', cascade='all, delete-orphan', lazy=True)
+    # Likes weighted by recency, see rankings.py; only the order is meaningful
+    trending = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+
+    __table_args__ = (
+        # Category listings: filter by category, newest (highest id) first, keyset on id
+        db.Index('ix_recipe_category_id', 'category', 'id'),
+        # Recipes of one user (ownership checks, the user.recipes backref)
+        db.Index('ix_recipe_user_id', 'user_id'),
+        # Top and trending views of a category, read in index order
+        db.Index('ix_recipe_category_likes', 'category', 'likes'),
+        db.Index('ix_recipe_category_trending', 'category', 'trending'),
+    )
+    # user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    @validates('ingredients')
+    def _parse_ingredients(self, key, value):
+        if value == self.ingredients and self.ingredient_lines is not None:
+            return value  # populate_obj sets every field; keep the index rows
+        self.ingredient_lines = recipe_text.parse_lines(value)
+        self.ingredient_terms = [RecipeIngredient(term=term)
+                                 for term in recipe_text.ingredient_terms(self.ingredient_lines)]
+        return value
+
+    @validates('instructions')
+    def _parse_instructions(self, key, value):
+        self.instruction_steps = recipe_text.parse_lines(value)
+        return value
+
+class RecipeIngredient(db.Model):
+    # One row per ingredient word per recipe; the primary key is the "containing basil" index
+    term = db.Column(db.String(recipe_text.MAX_TERM_LENGTH), primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), primary_key=True, index=True)
+
+class RecipeLike(db.Model):
+    # One row per user per liked recipe; the primary key stops double likes
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), primary_key=True, index=True)
+    liked_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, index=True)  # The trending event log
+
+class ImageRef(db.Model):
+    # One row per stored image, counting the recipes that use it
+    key = db.Column(db.String(255), primary_key=True)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    # Work to do after a commit (see jobs.py); deleted once it succeeds
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_until = db.Column(db.DateTime, nullable=True)  # Leased to a worker until then
+    error = db.Column(db.Text, nullable=True)  # Of the last failed attempt
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class DeadJob(db.Model):
+    # Jobs that failed JOBS_MAX_ATTEMPTS times; `flask jobs retry` queues them again
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    failed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class RankingState(db.Model):
+    # One row: the time trending scores are measured from (moved forward by compaction)
+    id = db.Column(db.Integer, primary_key=True)
+    epoch = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,76 @@
+# passwords.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# WERKZEUG'S DEFAULT PARAMETERS, TO COMPARE A SHORT METHOD NAME WITH A STORED HASH
+_DEFAULT_ARGS = {
+    'scrypt': ('32768', '8', '1'),
+    'pbkdf2': ('sha256', str(DEFAULT_PBKDF2_ITERATIONS)),
+}
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def normalize_method(method):
+    """``method`` with Werkzeug's defaults filled in, as it appears in a hash.
+
+    ``'scrypt'`` becomes ``'scrypt:32768:8:1'``, ``'pbkdf2:sha512'`` becomes
+    ``'pbkdf2:sha512:1000000'``.
+    """
+    name, *args = method.split(':')
+    defaults = _DEFAULT_ARGS.get(name, ())
+    return ':'.join([name, *args, *defaults[len(args):]])
+
+
+def needs_rehash(password_hash):
+    """True if ``password_hash`` was made with other than the configured method."""
+    stored_method = password_hash.split('$', 1)[0]
+    return stored_method != normalize_method(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def _get_executor():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = current_app.config['PASSWORD_WORKERS']
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+            # RUNNING PLUS WAITING; BEYOND THAT A LOGIN IS TURNED AWAY, NOT QUEUED
+            _slots = threading.BoundedSemaphore(workers + current_app.config['PASSWORD_QUEUE_SIZE'])
+    return _executor
+
+
+def submit(fn, *args):
+    """Run ``fn(*args)`` on the hashing pool; returns a Future.
+
+    At most ``PASSWORD_WORKERS`` hashes run at once, so a burst of logins
+    cannot take every CPU from the other routes. Raises 503 when
+    ``PASSWORD_QUEUE_SIZE`` more are already waiting. Async views can
+    ``await asyncio.wrap_future(submit(...))``.
+    """
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        raise ServiceUnavailable('Too many logins at once, please try again.',
+                                 retry_after=1)
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def hash_password(password):
+    config = current_app.config
+    return submit(generate_password_hash, password, config['PASSWORD_HASH_METHOD'],
+                  config['PASSWORD_SALT_LENGTH']).result()
+
+
+def verify_password(password_hash, password):
+    return submit(check_password_hash, password_hash, password).result()
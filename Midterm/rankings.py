@@ -0,0 +1,164 @@
+# rankings.py
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, render_template, request
+from flask.cli import AppGroup
+from sqlalchemy import desc, event, insert, select, update
+
+import jobs
+from cache import get_cache, listing_key
+from conditional import conditional, make_etag
+from extensions import db
+from listing import Page, attach_authors, card_query, listing_validators, to_cards
+from models import RankingState, Recipe, RecipeLike
+
+# VIEW NAME -> RECIPE COLUMN IT IS SORTED BY
+RANKINGS = {'top': 'likes', 'trending': 'trending'}
+
+rankings_cli = AppGroup('rankings', help='Maintain the trending scores.')
+
+
+def like_weight(liked_at, epoch):
+    """What one like at ``liked_at`` adds to a trending score measured from ``epoch``.
+
+    A like is worth twice as much as one TRENDING_HALF_LIFE_HOURS older.
+    Rather than decaying every score as time passes, newer likes simply
+    weigh more, which orders recipes exactly as decayed scores would. The
+    weights grow without bound, so compaction moves the epoch forward.
+    """
+    half_life = current_app.config['TRENDING_HALF_LIFE_HOURS'] * 3600
+    return 2.0 ** ((liked_at - epoch).total_seconds() / half_life)
+
+
+def _first_epoch():
+    return datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+
+def get_epoch(connection):
+    """The current epoch; ``connection`` may be a Session or a Connection.
+
+    The row is created with the table (by the migration or by
+    :func:`_seed_epoch`); should it be missing, the first of several
+    concurrent callers adds it and the others read that one.
+    """
+    query = select(RankingState.epoch).where(RankingState.id == 1)
+    epoch = connection.execute(query).scalar()
+    if epoch is None:
+        connection.execute(insert(RankingState).values(id=1, epoch=_first_epoch())
+                           .prefix_with('OR IGNORE', dialect='sqlite'))
+        epoch = connection.execute(query).scalar()
+    return epoch
+
+
+def trending_increment(connection, liked_at):
+    """Score to add for likes at the times in ``liked_at``."""
+    epoch = get_epoch(connection)
+    return sum(like_weight(moment, epoch) for moment in liked_at)
+
+
+def compact():
+    """Recompute every trending score from the like log against a new epoch.
+
+    Likes older than TRENDING_WINDOW_HOURS no longer count. Returns how many
+    recipes have a score.
+    """
+    config = current_app.config
+    session = db.session
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=config['TRENDING_WINDOW_HOURS'])
+    scores = defaultdict(float)
+    likes = (select(RecipeLike.recipe_id, RecipeLike.liked_at)
+             .where(RecipeLike.liked_at >= cutoff)
+             .execution_options(yield_per=10000))
+    for recipe_id, liked_at in session.execute(likes):
+        scores[recipe_id] += like_weight(liked_at, now)
+    session.execute(update(Recipe).where(Recipe.trending != 0).values(trending=0.0))
+    if scores:
+        # ONE executemany, BY PRIMARY KEY
+        session.execute(update(Recipe), [{'id': recipe_id, 'trending': score}
+                                         for recipe_id, score in scores.items()])
+    get_epoch(session)
+    session.execute(update(RankingState).where(RankingState.id == 1).values(epoch=now))
+    session.commit()
+    get_cache().delete_prefix('listing:')
+    return len(scores)
+
+
+@jobs.task('rankings.compact')
+def compact_job(repeat=False):
+    compact()
+    if repeat:
+        jobs.enqueue('rankings.compact', delay=current_app.config['TRENDING_COMPACT_INTERVAL'], repeat=True)
+
+
+def ranked_page(model, category, ranking, after=None, per_page=None):
+    """One page of the top RANKING_TOP_N recipes of ``category`` by ``ranking``.
+
+    ``after`` is the number of recipes on earlier pages. The (category,
+    column) index is read in order, so a page costs O(page size) however
+    large the category is, and pages stop at RANKING_TOP_N.
+    """
+    config = current_app.config
+    per_page = per_page or config['LISTING_PAGE_SIZE']
+    offset = after or 0
+    limit = min(per_page, config['RANKING_TOP_N'] - offset)
+    if limit <= 0:
+        return Page(items=[], next_cursor=None, per_page=per_page)
+    column = getattr(model, RANKINGS[ranking])
+    rows = (card_query(model, category)
+            .order_by(None).order_by(desc(column), desc(model.id))
+            .offset(offset).limit(limit + 1).all())
+    items = rows[:limit]
+    more = len(rows) > limit and offset + limit < config['RANKING_TOP_N']
+    if config['LISTING_AUTHOR_LOADING'] == 'cache':
+        attach_authors(model, items)
+    return Page(items=items, next_cursor=offset + limit if more else None, per_page=per_page)
+
+
+def render_ranking(template, model, category, ranking, **context):
+    """Render a top or trending view of ``category``, read through the cache."""
+    after = request.args.get('after', type=int)
+    validators = listing_validators(model, category)
+
+    def render():
+        def fetch():
+            page = ranked_page(model, category, ranking, after=after)
+            return page._replace(items=to_cards(page.items))
+        page = get_cache().get_or_set(f'{listing_key(category, *validators)}{ranking}:after={after}', fetch)
+        context.update(recipes=page.items, page=page, rank_offset=after or 0)
+        return render_template(template, **context)
+
+    # LIKES BUMP A RECIPE'S version, SO THE AGGREGATE COVERS THE ORDER TOO
+    etag = make_etag(template, category, ranking, after, *validators)
+    return conditional(etag, validators.last_modified, render)
+
+
+@rankings_cli.command('compact')
+def compact_command():
+    """Recompute trending scores now."""
+    click.echo(f'{compact()} recipes have a trending score.')
+
+
+@rankings_cli.command('schedule')
+def schedule_command():
+    """Queue a compaction that repeats every TRENDING_COMPACT_INTERVAL seconds."""
+    from models import Job
+    if db.session.query(Job.id).filter_by(name='rankings.compact').first() is not None:
+        click.echo('Compaction is already scheduled.')
+        return
+    jobs.enqueue('rankings.compact', repeat=True)
+    db.session.commit()
+    click.echo('Compaction scheduled.')
+
+
+def _seed_epoch(target, connection, **kw):
+    connection.execute(insert(target).values(id=1, epoch=_first_epoch()))
+
+
+def init_app(app):
+    # THE TABLE IS SHARED BY EVERY APP create_app() BUILDS; LISTEN ONCE
+    if not event.contains(RankingState.__table__, 'after_create', _seed_epoch):
+        event.listen(RankingState.__table__, 'after_create', _seed_epoch)
+    app.cli.add_command(rankings_cli)
@@ -0,0 +1,279 @@
+# recipe_io.py
+import csv
+import json
+import os
+import tarfile
+import time
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select
+
+import image_pipeline
+import image_store
+import recipe_text
+import search_index
+from cache import get_cache, listing_key
+from db_config import WRITER_BIND
+from extensions import db
+from models import ImageRef, Recipe, User
+
+# COLUMNS OF AN EXPORTED RECIPE, IN CSV ORDER; THE AUTHOR GOES BY USERNAME
+FIELDS = ('title', 'description', 'ingredients', 'instructions', 'image', 'likes', 'category', 'username')
+FORMATS = ('jsonl', 'csv')
+
+recipes_cli = AppGroup('recipes', help='Bulk import and export of recipes.')
+
+
+def _format_of(stream, fmt):
+    if fmt is None:
+        fmt = 'csv' if getattr(stream, 'name', '').endswith('.csv') else 'jsonl'
+    return fmt
+
+
+def export_rows(db, recipe_model, user_model, batch_size=1000):
+    """Yield every recipe as a dict of :data:`FIELDS`, oldest first.
+
+    Rows are fetched ``batch_size`` at a time from one open cursor, so
+    memory use does not grow with the table.
+    """
+    columns = [getattr(recipe_model, name) for name in FIELDS[:-1]]
+    query = (select(*columns, user_model.username)
+             .join(user_model, recipe_model.user_id == user_model.id)
+             .order_by(recipe_model.id)
+             .execution_options(yield_per=batch_size))
+    for row in db.session.execute(query):
+        yield dict(zip(FIELDS, row))
+
+
+def read_rows(stream, fmt):
+    """Yield recipe dicts from a JSON Lines or CSV stream, one line at a time."""
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_images_tar(path, keys):
+    """Write the image files named by ``keys`` to a tar at ``path``; returns how many."""
+    count = 0
+    with tarfile.open(path, 'w') as tar:
+        for key in keys:
+            file_path = os.path.join(image_pipeline.folder_of(key), key)
+            if os.path.isfile(file_path):
+                tar.add(file_path, arcname=key, recursive=False)
+                count += 1
+    return count
+
+
+def read_images_tar(path):
+    """Store every image in the tar at ``path``; returns (exported key -> stored key, new keys).
+
+    Each file is hashed into the content-addressed store as it is read, so
+    images already stored are not duplicated and legacy file names get a
+    content key too.
+    """
+    folder = image_pipeline.store_folder()
+    keys, created_keys = {}, []
+    with tarfile.open(path, 'r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            ext = os.path.splitext(member.name)[1].lower()
+            if ext not in image_pipeline.IMAGE_EXTENSIONS:
+                continue
+            key, created = image_store.write_image(folder, tar.extractfile(member), ext)
+            keys[member.name] = key
+            if created:
+                created_keys.append(key)
+    return keys, created_keys
+
+
+def _likes(value):
+    """The ``likes`` of an imported row as a count, or None if it is not one."""
+    if value is None or value == '':
+        return 0
+    try:
+        likes = int(str(value).strip())
+    except ValueError:
+        return None
+    return likes if likes >= 0 else None
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class Importer:
+    """Inserts recipes in large transactions with one ``executemany`` per table.
+
+    Ids are assigned here, so the ``recipe_ingredient`` rows of a batch can
+    be inserted without reading anything back. On SQLite every batch starts
+    with ``BEGIN IMMEDIATE``, so no other writer can take the same ids
+    between reading ``max(id)`` and the insert. Rows that cannot be imported
+    are counted in ``skipped`` and the reason, with the row number, is added
+    to ``problems``.
+    """
+
+    def __init__(self, db, recipe_model, user_model, image_keys=None, default_user=None):
+        self.engine = db.engines.get(WRITER_BIND, db.engine)
+        # THE WRITER ENGINE ALREADY BEGINS WITH BEGIN IMMEDIATE
+        self.begin_immediate = self.engine.dialect.name == 'sqlite' and WRITER_BIND not in db.engines
+        self.recipe_table = recipe_model.__table__
+        self.term_table = recipe_model.ingredient_terms.property.mapper.class_.__table__
+        self.user_model = user_model
+        self.image_keys = image_keys or {}
+        self.default_user = default_user
+        self.user_ids = {}
+        self.categories = set()
+        self.images = set()
+        self.imported = 0
+        self.skipped = 0
+        self.rows_read = 0
+        self.problems = []
+
+    def _user_id(self, connection, username):
+        # UNKNOWN AUTHORS GO TO --user, IF GIVEN
+        if username not in self.user_ids:
+            self.user_ids[username] = connection.execute(
+                select(self.user_model.id).where(self.user_model.username == username)).scalar()
+        user_id = self.user_ids[username]
+        if user_id is None and self.default_user and username != self.default_user:
+            return self._user_id(connection, self.default_user)
+        return user_id
+
+    def import_batch(self, rows):
+        with self.engine.begin() as connection:
+            if self.begin_immediate:
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+            next_id = connection.execute(select(func.coalesce(func.max(self.recipe_table.c.id), 0))).scalar() + 1
+            recipes, terms = [], []
+            for row in rows:
+                self.rows_read += 1
+                user_id = self._user_id(connection, row.get('username'))
+                if user_id is None or not row.get('title'):
+                    self.skipped += 1
+                    continue
+                likes = _likes(row.get('likes'))
+                if likes is None:
+                    self.skipped += 1
+                    self.problems.append(f"Row {self.rows_read}: likes must be a whole number, not {row['likes']!r}")
+                    continue
+                ingredient_lines = recipe_text.parse_lines(row.get('ingredients'))
+                image = row.get('image') or None
+                image = self.image_keys.get(image, image)
+                category = (row.get('category') or '').lower() or None
+                recipes.append({
+                    'id': next_id,
+                    'title': row['title'],
+                    'description': row.get('description') or '',
+                    'ingredients': row.get('ingredients') or '',
+                    'instructions': row.get('instructions') or '',
+                    'ingredient_lines': ingredient_lines,
+                    'instruction_steps': recipe_text.parse_lines(row.get('instructions')),
+                    'image': image,
+                    'likes': likes,
+                    'category': category,
+                    'user_id': user_id,
+                })
+                terms.extend({'term': term, 'recipe_id': next_id}
+                             for term in recipe_text.ingredient_terms(ingredient_lines))
+                self.categories.add(category)
+                if image_store.is_content_addressed(image):
+                    self.images.add(image)
+                next_id += 1
+            if recipes:
+                connection.execute(insert(self.recipe_table), recipes)
+            if terms:
+                connection.execute(insert(self.term_table), terms)
+        self.imported += len(recipes)
+
+    def count_image_refs(self, ref_model):
+        """Recount :class:`ImageRef` for every stored image the import used."""
+        recipe = self.recipe_table.c
+        images = sorted(self.images)
+        with self.engine.begin() as connection:
+            for keys in _batches(images, 500):
+                connection.execute(delete(ref_model).where(ref_model.key.in_(keys)))
+                connection.execute(insert(ref_model).from_select(
+                    ['key', 'refcount'],
+                    select(recipe.image, func.count()).where(recipe.image.in_(keys)).group_by(recipe.image)))
+
+
+@recipes_cli.command('export')
+@click.argument('output', type=click.File('w', encoding='utf-8', lazy=True), default='-')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Default: from the file name, else jsonl.')
+@click.option('--images', 'images_path', type=click.Path(dir_okay=False, writable=True),
+              help='Also write the recipes\' image files to this tar.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+def export_command(output, fmt, images_path, batch_size):
+    """Write every recipe to OUTPUT (default: stdout) as JSON Lines or CSV."""
+    fmt = _format_of(output, fmt)
+    writer = csv.DictWriter(output, FIELDS, lineterminator='\n') if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+    images = set()
+    count = 0
+    for row in export_rows(db, Recipe, User, batch_size):
+        if writer:
+            writer.writerow(row)
+        else:
+            output.write(json.dumps(row, ensure_ascii=False) + '\n')
+        if row['image']:
+            images.add(row['image'])
+        count += 1
+    output.flush()
+    click.echo(f'Exported {count} recipes.', err=True)
+    if images_path:
+        click.echo(f'Wrote {write_images_tar(images_path, sorted(images))} images to {images_path}.', err=True)
+
+
+@recipes_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Default: from the file name, else jsonl.')
+@click.option('--images', 'images_path', type=click.Path(exists=True, dir_okay=False),
+              help='Tar of image files written by export --images.')
+@click.option('--user', 'default_user', help='Author for rows without a known username.')
+@click.option('--batch-size', default=10000, show_default=True, help='Recipes inserted per transaction.')
+@click.option('--workers', default=None, type=int, help='Processes resizing new images (default: CPU count).')
+def import_command(source, fmt, images_path, default_user, batch_size, workers):
+    """Insert the recipes in SOURCE (default: stdin), JSON Lines or CSV.
+
+    The search index stays live, so writes made by the site during the
+    import are indexed too; it is optimized once at the end. Resized copies
+    of new images are generated after the import.
+    """
+    start = time.perf_counter()
+    image_keys, created_keys = read_images_tar(images_path) if images_path else ({}, [])
+    importer = Importer(db, Recipe, User, image_keys, default_user)
+    with_fts = search_index.fts_supported(importer.engine)
+    try:
+        for batch in _batches(read_rows(source, _format_of(source, fmt)), batch_size):
+            importer.import_batch(batch)
+            for problem in importer.problems:
+                click.echo(problem, err=True)
+            importer.problems.clear()
+            click.echo(f'{importer.imported} recipes...', err=True)
+    finally:
+        if with_fts:
+            with importer.engine.begin() as connection:
+                search_index.optimize_search_index(connection)
+        importer.count_image_refs(ImageRef)
+        get_cache().delete_prefix(*[listing_key(category) for category in importer.categories if category])
+    click.echo(f'Imported {importer.imported} recipes ({importer.skipped} skipped) '
+               f'in {time.perf_counter() - start:.1f}s.', err=True)
+    if created_keys:
+        count = image_pipeline.backfill_derivatives(image_pipeline.store_folder(), created_keys,
+                                                    tuple(current_app.config['IMAGE_WIDTHS']), workers)
+        click.echo(f'Wrote {count} derivatives for {len(created_keys)} new images.', err=True)
+
+
+def init_app(app):
+    app.cli.add_command(recipes_cli)
@@ -0,0 +1,45 @@
+# recipe_text.py
+import re
+
+# WORDS IN AN INGREDIENT LINE THAT NAME NO INGREDIENT
+_NOT_INGREDIENTS = frozenset('''
+    a an and or of the to for with without into in on about plus optional taste
+    cup cups tbsp tsp tablespoon tablespoons teaspoon teaspoons oz ounce ounces lb lbs pound pounds
+    g gram grams kg ml l liter liters litre litres pinch dash handful clove cloves can cans
+    slice slices piece pieces large medium small fresh freshly chopped diced minced sliced
+    ground finely roughly peeled whole half quarter
+'''.split())
+_WORD = re.compile(r'[^\W\d_]+')
+
+# LONGEST TERM STORED IN THE recipe_ingredient INDEX
+MAX_TERM_LENGTH = 100
+
+
+def _term(word):
+    # "lemons" AND "lemon" ARE THE SAME INGREDIENT
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    return word[:MAX_TERM_LENGTH]
+
+
+def parse_lines(text):
+    """Non-blank, stripped lines of a textarea, in order."""
+    return [line.strip() for line in (text or '').splitlines() if line.strip()]
+
+
+def ingredient_terms(lines):
+    """Lowercase words naming ingredients, for "recipes containing basil".
+
+    Quantities, units and filler words are dropped; each term appears once.
+    """
+    terms = {}
+    for line in lines:
+        for word in _WORD.findall(line.lower()):
+            if len(word) > 1 and word not in _NOT_INGREDIENTS:
+                terms.setdefault(_term(word), None)
+    return list(terms)
+
+
+def normalize_term(term):
+    words = _WORD.findall((term or '').lower())
+    return _term(words[0]) if words else None
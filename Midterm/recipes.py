@@ -0,0 +1,242 @@
+# recipes.py
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, abort, jsonify
+from flask_login import login_required, current_user
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+import os
+
+from extensions import db
+from form import RecipeForm, DeleteRecipeForm
+from listing import detail_query, recipe_detail, render_listing
+from conditional import conditional, make_etag
+from media import save_image, delete_image
+from models import Recipe, RecipeLike
+from rankings import render_ranking
+import cache
+import likes
+
+bp = Blueprint('recipes', __name__)
+
+
+@bp.route('/')
+def index():
+    # The category tiles are static; no recipe is read
+    return render_template('index.html')
+
+# Category
+@bp.route('/category/<category_name>')
+def category(category_name):
+    # Retrieve one page of recipe cards for the category, newest first
+    return render_listing('category.html', Recipe, category_name, category_name=category_name)
+
+
+@bp.route('/category/<category_name>/top')
+def category_top(category_name):
+    # Most liked recipes of the category, read in (category, likes) index order
+    return render_ranking('ranking.html', Recipe, category_name, 'top',
+                          category_name=category_name, title='Most Liked')
+
+
+@bp.route('/category/<category_name>/trending')
+def category_trending(category_name):
+    # Recipes liked most recently, see rankings.py
+    return render_ranking('ranking.html', Recipe, category_name, 'trending',
+                          category_name=category_name, title='Trending')
+
+
+# main dish
+@bp.route('/main_dish')
+def main_dish():
+    return render_listing('main_dish.html', Recipe, 'main_dish')
+
+# Edit Recipe
+@bp.route('/edit_recipeonetime/<int:recipe_id>', methods=['GET'])
+def edit_recipeonetime(recipe_id):
+    recipe = Recipe.query.get_or_404(recipe_id)
+
+    if 'image' in request.files:
+        uploaded_file = request.files['image']
+        if uploaded_file.filename != '':
+            filename = secure_filename(uploaded_file.filename)
+            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+            uploaded_file.save(file_path)
+            recipe.image = filename
+    # Assuming 'new_image_filename.jpg' is the desired filename
+    # recipe.image = 'new_image_filename.jpg'
+
+    db.session.commit()
+    cache.invalidate_recipe(recipe.id, recipe.category)
+
+    return redirect('/')
+
+# veggies
+@bp.route('/vegetables')
+def vegetables():
+    return render_listing('vegetables.html', Recipe, 'vegetables')
+
+# cocktail
+@bp.route('/cocktail')
+def cocktail():
+    return render_listing('cocktail.html', Recipe, 'cocktail')
+
+# Dessert
+@bp.route('/dessert')
+def dessert():
+    username = str(current_user.username) if current_user.is_authenticated else ''
+    return render_listing('dessert.html', Recipe, 'dessert', username=username)
+
+
+
+
+# Like Recipe
+@bp.route('/like_recipe/<int:recipe_id>', methods=['POST'])
+@login_required
+def like_recipe(recipe_id):
+    # Only check that the recipe exists; the count is updated in the database
+    found = db.session.query(Recipe.id, Recipe.category).filter_by(id=recipe_id).first()
+    if found is None:
+        abort(404)
+
+    if likes.like_recipe(Recipe, RecipeLike, current_user.id, recipe_id):
+        cache.invalidate_recipe(recipe_id, found.category)
+        flash('You liked the recipe!', 'success')
+    else:
+        flash('You already liked this recipe.', 'info')
+    return redirect(url_for('recipes.view_recipe', recipe_id=recipe_id))
+
+# View recipe
+@bp.route('/view_recipe/<int:recipe_id>')
+def view_recipe(recipe_id):
+    # Validators first: a primary-key lookup of two small columns
+    current = db.session.query(Recipe.version, Recipe.updated_at).filter_by(id=recipe_id).first()
+    if current is None:
+        # Handle case where recipe is not found
+        abort(404)
+
+    def render():
+        def fetch():
+            return recipe_detail(detail_query(Recipe).filter_by(id=recipe_id).one())
+        recipe = cache.get_cache().get_or_set(cache.recipe_key(recipe_id, current.version) + 'detail', fetch)
+        likes_count = (recipe.likes or 0) + likes.pending_likes(recipe.id)
+        return render_template('view_recipe.html', recipe=recipe, version=current.version, likes_count=likes_count)
+
+    etag = make_etag('recipe', recipe_id, current.version, likes.pending_likes(recipe_id))
+    return conditional(etag, current.updated_at, render)
+
+
+
+
+# ****************
+@bp.route('/add_recipe', methods=['GET', 'POST'])
+@login_required
+def add_recipe():
+    form = RecipeForm()
+    if form.validate_on_submit():
+        # HANDLE FILE UPLOAD
+        image_filename = None
+        if form.image.data:  # CHECK IF IMAGE DATA EXISTS
+            image = form.image.data
+            image_filename = save_image(image)  # SAVE THE IMAGE AND GET THE FILENAME
+
+        # CREATE A NEW RECIPE OBJECT
+        new_recipe = Recipe(
+            title=form.title.data,
+            description=form.description.data,
+            ingredients=form.ingredients.data,
+            instructions=form.instructions.data,
+            image=image_filename,  # USE FILENAME INSTEAD OF FileStorage OBJECT
+            likes=0,  # SET LIKES DEFAULT VALUE
+            category=form.category.data.lower(),  # ENSURE CATEGORY IS LOWERCASE
+            user_id=current_user.id
+        )
+        # ADD THE NEW RECIPE TO THE DATABASE
+        db.session.add(new_recipe)
+        db.session.commit()
+        cache.invalidate_recipe(new_recipe.id, new_recipe.category)
+
+        # REDIRECT TO THE APPROPRIATE CATEGORY PAGE
+        return redirect(url_for('recipes.category', category_name=new_recipe.category))
+
+    return render_template('add_recipe.html', form=form)
+
+
+# Edit Recipe
+# Edit Recipe
+@bp.route('/edit_recipe/<int:recipe_id>', methods=['GET', 'POST'])
+@login_required
+def edit_recipe(recipe_id):
+    recipe = Recipe.query.get_or_404(recipe_id)
+
+    # Check if the current user is the owner of the recipe
+    if recipe.user_id != current_user.id:  # Compare ids; loading recipe.user costs a query
+        flash('You are not authorized to edit this recipe.', 'error')
+        return redirect(url_for('recipes.index'))  # Redirect the user back to the home page
+
+    form = RecipeForm(obj=recipe)
+    if form.validate_on_submit():
+        old_image = recipe.image
+        old_category = recipe.category
+        # Update the recipe object with form data
+        form.populate_obj(recipe)
+        recipe.image = old_image  # populate_obj puts the upload (or None) here
+
+        # Handle image upload if a new image is provided (otherwise the field holds the old filename)
+        if isinstance(form.image.data, FileStorage):
+            image = form.image.data
+            # Save the new image first so re-uploading the same photo keeps its file
+            recipe.image = save_image(image)  # SAVE THE NEW IMAGE AND GET THE FILENAME
+            delete_image(old_image)  # Drop this recipe's reference to the old image
+
+        # Ensure category is lowercase
+        if form.category.data:
+            recipe.category = form.category.data.lower()
+
+        db.session.commit()
+        cache.invalidate_recipe(recipe.id, old_category, recipe.category)
+        flash('Your recipe has been updated!', 'success')
+
+        # Redirect to the appropriate page based on the new category
+        if recipe.category == 'dessert':
+            return redirect(url_for('recipes.dessert'))
+        elif recipe.category == 'vegetables':
+            return redirect(url_for('recipes.vegetables'))
+        elif recipe.category == 'cocktail':
+            return redirect(url_for('recipes.cocktail'))
+        else:
+            return redirect(url_for('recipes.index'))
+
+    return render_template('edit_recipe.html', form=form)
+
+
+# Cache hit/miss counters
+@bp.route('/cache/stats')
+def cache_stats():
+    return jsonify(cache.get_cache().stats())
+
+# Delete recipe
+@bp.route('/delete_recipe/<int:recipe_id>', methods=['GET', 'POST'])
+@login_required  # Ensure that only logged-in users can access this route
+def delete_recipe(recipe_id):
+    # Retrieve the recipe from the database based on the provided recipe_id
+    recipe = Recipe.query.get_or_404(recipe_id)
+
+    # Check if the current user is the owner of the recipe
+    if recipe.user_id != current_user.id:  # Compare ids; loading recipe.user costs a query
+        flash('You are not authorized to delete this recipe.', 'error')
+        return redirect(url_for('recipes.index'))
+
+    form = DeleteRecipeForm()  # Create an instance of the DeleteRecipeForm
+    if request.method == 'POST' and form.validate_on_submit():
+        # Delete the recipe from the database
+        category_name = recipe.category
+        delete_image(recipe.image)
+        RecipeLike.query.filter_by(recipe_id=recipe.id).delete()
+        db.session.delete(recipe)
+        db.session.commit()
+        cache.invalidate_recipe(recipe_id, category_name)
+
+        # Redirect to the index page or any other appropriate page
+        flash('Recipe deleted successfully!', 'success')
+        return redirect(url_for('recipes.index'))
+
+    return render_template('delete.html', recipe=recipe, form=form)
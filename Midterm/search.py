@@ -0,0 +1,35 @@
+# search.py
+from flask import Blueprint, render_template, request, jsonify
+
+from conditional import conditional, make_etag
+import search_index
+from models import Recipe
+
+bp = Blueprint('search', __name__)
+
+
+@bp.route('/search')
+def search():
+    query = request.args.get('query', '')  # Get the search query from the URL parameter
+    ingredient = request.args.get('ingredient')  # "Recipes containing basil"
+    page = request.args.get('page', 1, type=int)
+    columns = ('id', 'title', 'version', 'updated_at')
+    if ingredient:
+        results = search_index.recipes_with_ingredient(Recipe, ingredient, page=page, columns=columns)
+    else:
+        # Ranked full-text match over title, description, ingredients and instructions
+        results = search_index.search_recipes(Recipe, query, page=page, columns=columns)
+    # The results themselves are the validator; only the template is skipped on a 304
+    etag = make_etag('search', query, ingredient, page, results.has_next,
+                     [(recipe.id, recipe.version) for recipe in results.items])
+    last_modified = max((recipe.updated_at for recipe in results.items if recipe.updated_at), default=None)
+    return conditional(etag, last_modified, lambda: render_template(
+        'search_results.html', recipes=results.items, results=results, query=query,
+        ingredient=ingredient))
+
+# Type-ahead suggestions for the search box
+@bp.route('/search/suggest')
+def suggest():
+    query = request.args.get('query', '')
+    results = search_index.search_recipes(Recipe, query, per_page=10)
+    return jsonify([{'id': recipe.id, 'title': recipe.title} for recipe in results.items])
@@ -0,0 +1,203 @@
+# search_index.py
+import re
+from collections import namedtuple
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, event, select, text
+from sqlalchemy.orm import load_only
+
+import recipe_text
+
+FTS_TABLE = 'recipe_fts'
+FTS_COLUMNS = ('title', 'description', 'ingredients', 'instructions')
+# BM25 WEIGHTS, IN FTS_COLUMNS ORDER: A TITLE HIT COUNTS MOST
+FTS_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+FTS_TRIGGERS = tuple(f'{FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au'))
+
+SearchPage = namedtuple('SearchPage', ['items', 'page', 'has_next', 'per_page'])
+
+search_cli = AppGroup('search', help='Manage the recipe full-text search index.')
+
+_columns = ', '.join(FTS_COLUMNS)
+_new_values = ', '.join('new.' + c for c in FTS_COLUMNS)
+_old_values = ', '.join('old.' + c for c in FTS_COLUMNS)
+
+# EXTERNAL-CONTENT FTS5 TABLE OVER recipe, KEPT IN SYNC BY TRIGGERS SO EVERY
+# WRITE (ORM OR RAW SQL) UPDATES THE INDEX IN THE SAME TRANSACTION
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_columns},
+        content='recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+    END""",
+    # ONLY THE INDEXED COLUMNS FIRE THIS, SO A LIKE DOES NOT TOUCH THE INDEX
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END""",
+    # MAKE "ORDER BY rank" USE OUR WEIGHTED BM25
+    f"""INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({", ".join(map(str, FTS_WEIGHTS))})')""",
+]
+
+
+def fts_supported(engine):
+    return engine.dialect.name == 'sqlite'
+
+
+def include_name(name, type_, parent_names):
+    """Alembic ``include_name``: autogenerate must not drop the FTS table or its shadow tables."""
+    return not (type_ == 'table' and (name == FTS_TABLE or name.startswith(FTS_TABLE + '_')))
+
+
+def create_search_index(connection):
+    """Create the FTS table and its sync triggers if they do not exist yet."""
+    for statement in FTS_DDL:
+        connection.execute(text(statement))
+
+
+def drop_search_triggers(connection):
+    """Stop indexing writes (for bulk loads into a database nothing else writes to).
+
+    :func:`rebuild_search_index` restores them.
+    """
+    for trigger in FTS_TRIGGERS:
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+
+
+def rebuild_search_index(connection):
+    """Re-read every recipe into the index (for databases created before it)."""
+    create_search_index(connection)
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    optimize_search_index(connection)
+
+
+def optimize_search_index(connection):
+    """Merge the index segments left by many small writes into one."""
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def ensure_search_index(connection):
+    """Build the index for a database that predates it or lost its triggers.
+
+    Without the triggers (e.g. a bulk load that was killed) writes went
+    unindexed, so the whole index is rebuilt.
+    """
+    names = (FTS_TABLE,) + FTS_TRIGGERS
+    found = connection.execute(
+        text('SELECT count(*) FROM sqlite_master WHERE name IN :names').bindparams(bindparam('names', expanding=True)),
+        {'names': list(names)},
+    ).scalar()
+    if found < len(names):
+        rebuild_search_index(connection)
+
+
+def match_expression(query, prefix=True):
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted so user input can never be parsed as FTS syntax, and
+    the last word gets a ``*`` so partially typed words match (type-ahead).
+    Returns ``None`` when the query has no searchable words.
+    """
+    words = re.findall(r'\w+', query or '')
+    if not words:
+        return None
+    terms = ['"%s"' % word for word in words]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def match_statement(expression, limit, offset):
+    """Rowids of the recipes matching an FTS5 ``expression``, best match first."""
+    return text(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q '
+                'ORDER BY rank LIMIT :limit OFFSET :offset').bindparams(q=expression, limit=limit, offset=offset)
+
+
+def ingredient_criterion(model, term):
+    """``model.id IN (recipes whose ingredient terms include term)``."""
+    term_model = model.ingredient_terms.property.mapper.class_
+    return model.id.in_(select(term_model.recipe_id).where(term_model.term == term))
+
+
+def search_recipes(model, query, page=1, per_page=None, columns=('id', 'title')):
+    """Return one page of recipes matching ``query``, best match first."""
+    if per_page is None:
+        per_page = current_app.config['SEARCH_PAGE_SIZE']
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+    db = current_app.extensions['sqlalchemy']
+    options = load_only(*[getattr(model, name) for name in columns])
+
+    if not fts_supported(db.engine):
+        # NO FTS5 OUTSIDE SQLITE; FALL BACK TO A TITLE SCAN
+        rows = (model.query.options(options)
+                .filter(model.title.ilike(f'%{query}%'))
+                .order_by(model.id.desc())
+                .offset(offset).limit(per_page + 1).all())
+        return SearchPage(rows[:per_page], page, len(rows) > per_page, per_page)
+
+    expression = match_expression(query)
+    if expression is None:
+        return SearchPage([], page, False, per_page)
+    ids = db.session.execute(match_statement(expression, per_page + 1, offset)).scalars().all()
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    if not ids:
+        return SearchPage([], page, False, per_page)
+    # ONE PRIMARY-KEY LOOKUP FOR THE PAGE, THEN RESTORE THE RANKED ORDER
+    recipes = model.query.options(options).filter(model.id.in_(ids)).all()
+    position = {recipe_id: i for i, recipe_id in enumerate(ids)}
+    recipes.sort(key=lambda recipe: position[recipe.id])
+    return SearchPage(recipes, page, has_next, per_page)
+
+
+def recipes_with_ingredient(model, ingredient, page=1, per_page=None, columns=('id', 'title')):
+    """Return one page of recipes listing ``ingredient``, newest first.
+
+    Looked up in the ``recipe_ingredient`` term index written with each
+    recipe, not by scanning the ingredients text.
+    """
+    if per_page is None:
+        per_page = current_app.config['SEARCH_PAGE_SIZE']
+    page = max(page, 1)
+    term = recipe_text.normalize_term(ingredient)
+    if term is None:
+        return SearchPage([], page, False, per_page)
+    rows = (model.query.options(load_only(*[getattr(model, name) for name in columns]))
+            .filter(ingredient_criterion(model, term))
+            .order_by(model.id.desc())
+            .offset((page - 1) * per_page).limit(per_page + 1).all())
+    return SearchPage(rows[:per_page], page, len(rows) > per_page, per_page)
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Create (if needed) and repopulate the search index."""
+    db = current_app.extensions['sqlalchemy']
+    if not fts_supported(db.engine):
+        raise click.ClickException('Full-text search requires SQLite with FTS5.')
+    with db.engine.begin() as connection:
+        rebuild_search_index(connection)
+    click.echo('Search index rebuilt.')
+
+
+def _create_index(target, connection, **kw):
+    if fts_supported(connection):
+        create_search_index(connection)
+
+
+def init_app(app, model):
+    """Create the index alongside the recipe table and register the CLI."""
+    # THE TABLE IS SHARED BY EVERY APP create_app() BUILDS; LISTEN ONCE
+    if not event.contains(model.__table__, 'after_create', _create_index):
+        event.listen(model.__table__, 'after_create', _create_index)
+    app.cli.add_command(search_cli)
@@ -0,0 +1,261 @@
+# serving.py
+import asyncio
+import contextvars
+import functools
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from flask import current_app, request, request_started
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+import db_config
+import instrumentation
+from extensions import db
+
+ASYNC_VIEWS = {}  # endpoint -> async function(**view_args), used under ASGI only
+
+
+def async_view(endpoint):
+    """Serve ``endpoint`` with this coroutine function when running under ASGI.
+
+    The sync view stays the one used under WSGI; both must render the same
+    page from the same data.
+    """
+    def register(fn):
+        ASYNC_VIEWS[endpoint] = fn
+        return fn
+    return register
+
+
+def async_engine():
+    """The async engine of this worker process, created on first use."""
+    app = current_app._get_current_object()
+    engine = app.extensions.get('async_engine')
+    if engine is None:
+        engine = db_config.create_async_engine(app, db)
+        instrumentation.instrument_engine(app, engine.sync_engine)
+        app.extensions['async_engine'] = engine
+    return engine
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Await blocking ``fn(*args, **kwargs)`` run on the worker's thread pool.
+
+    It runs in a copy of the caller's context, so the request, ``g`` and
+    ``current_app`` are the caller's. For the database, cache and template
+    calls of :func:`async_view` coroutines, which must not block the loop.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(current_app.extensions.get('asgi_executor'), call)
+
+
+def _load_user():
+    # FILLS g._login_user, SO current_user ON THE LOOP IS A PLAIN LOOKUP
+    current_user._get_current_object()
+
+
+def _environ(scope, body):
+    """The WSGI environ of an ASGI HTTP ``scope``."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI CARRIES THE RAW BYTES AS LATIN-1
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+def _status(status):
+    return int(status.split(' ', 1)[0])
+
+
+def _headers(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+class AsgiAdapter:
+    """ASGI application around a Flask app (see asgi.py).
+
+    Request bodies are read on the event loop, spilling to a temporary file
+    past ASGI_BODY_MEMORY with the writes done on the thread pool, so a slow
+    upload holds no thread. Endpoints registered with :func:`async_view` then
+    run on the loop, after the logged-in user is loaded on the pool; every
+    other view runs on a pool of ASGI_THREADS threads, and its response body
+    (files included) is read there too, as is a streamed async view's.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(app.config['ASGI_THREADS'], thread_name_prefix='asgi')
+        app.extensions['asgi_executor'] = self.executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'websocket':
+            await send({'type': 'websocket.close'})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                engine = self.app.extensions.pop('async_engine', None)
+                if engine is not None:
+                    await engine.dispose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(scope, receive, send)
+        if body is None:
+            return
+        with body:
+            environ = _environ(scope, body)
+            view = self._async_view(environ)
+            if view is None:
+                await self._run_wsgi(environ, send)
+            else:
+                await self._run_async(environ, view, send)
+
+    async def _read_body(self, scope, receive, send):
+        """The request body as a file, or None if the client went away or sent too much."""
+        limit = self.app.config['MAX_CONTENT_LENGTH']
+        length = dict(scope['headers']).get(b'content-length')
+        if limit is not None and length is not None and length.isdigit() and int(length) > limit:
+            # FLASK ANSWERS 413 FROM THE HEADER ALONE, WITHOUT THE BODY
+            return io.BytesIO()
+        loop = asyncio.get_running_loop()
+        memory = self.app.config['ASGI_BODY_MEMORY']
+        body = SpooledTemporaryFile(max_size=memory)
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if limit is not None and size > limit:
+                body.close()
+                await send({'type': 'http.response.start', 'status': 413,
+                            'headers': [(b'content-type', b'text/plain')]})
+                await send({'type': 'http.response.body', 'body': b'Request Entity Too Large'})
+                return None
+            if size > memory:
+                await loop.run_in_executor(self.executor, body.write, chunk)
+            elif chunk:
+                body.write(chunk)
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        return body
+
+    def _async_view(self, environ):
+        if not ASYNC_VIEWS:
+            return None
+        adapter = self.app.url_map.bind_to_environ(environ, server_name=self.app.config['SERVER_NAME'])
+        try:
+            endpoint, _ = adapter.match()
+        except HTTPException:
+            return None
+        return ASYNC_VIEWS.get(endpoint)
+
+    async def _run_async(self, environ, view, send):
+        # THE SAME STEPS AS Flask.full_dispatch_request, WITH THE VIEW AWAITED
+        app = self.app
+        with app.request_context(environ):
+            try:
+                try:
+                    request_started.send(app, _async_wrapper=app.ensure_sync)
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        await run_sync(_load_user)
+                        rv = await view(**request.view_args)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                response = app.handle_exception(e)
+        # HANDLES HEAD AND 304 BODIES LIKE THE WSGI PATH
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        await send({'type': 'http.response.start', 'status': _status(status), 'headers': _headers(headers)})
+        if not response.is_streamed:
+            for chunk in app_iter:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        # A STREAMED TEMPLATE RENDERS AS IT IS READ; EVERY STEP RUNS IN ONE
+        # CONTEXT SO THE REQUEST CONTEXT IT PUSHES CAN BE POPPED AGAIN
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        iterator = iter(app_iter)
+        try:
+            while (chunk := await loop.run_in_executor(self.executor, context.run, next, iterator, None)) is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(app_iter, 'close'):
+                await loop.run_in_executor(self.executor, context.run, app_iter.close)
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def _run_wsgi(self, environ, send):
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'], started['headers'] = status, headers
+            return lambda data: None  # THE LEGACY write() CALLABLE; FLASK NEVER USES IT
+
+        def call():
+            iterable = self.app(environ, start_response)
+            iterator = iter(iterable)
+            # start_response MAY BE DEFERRED UNTIL THE FIRST CHUNK
+            return iterable, iterator, next(iterator, None)
+
+        iterable, iterator, chunk = await loop.run_in_executor(self.executor, call)
+        try:
+            await send({'type': 'http.response.start', 'status': _status(started['status']),
+                        'headers': _headers(started['headers'])})
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+        finally:
+            if hasattr(iterable, 'close'):
+                await loop.run_in_executor(self.executor, iterable.close)
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,70 @@
+# conftest.py
+import pytest
+
+import instrumentation
+from app import create_app, init_db
+from extensions import db
+from models import Recipe, User
+
+
+@pytest.fixture
+def app_config():
+    """Extra settings of ``app``; override with ``@pytest.mark.parametrize('app_config', [...])``."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'images'),
+        'IMAGE_STORE_FOLDER': str(tmp_path / 'media'),
+        'WTF_CSRF_ENABLED': False,
+        'JOBS_IN_PROCESS': False,
+        'CACHE_BACKEND': 'null',
+        'SLOW_QUERY_MS': None,
+        **app_config,
+    })
+    init_db(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(app):
+    """``count_queries()`` counts the statements run inside its ``with`` block.
+
+        with count_queries() as queries:
+            client.get('/dessert')
+        assert queries.count == 2, queries.statements
+    """
+    return lambda: instrumentation.count_queries(db.engine)
+
+
+@pytest.fixture
+def make_user(app):
+    def make(username='cook'):
+        user = User(username=username, email=f'{username}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def make_recipe(app):
+    def make(user, category='dessert', title='Cake', **fields):
+        recipe = Recipe(title=title, description='Sweet', ingredients='flour\nsugar',
+                        instructions='Mix\nBake', category=category, user_id=user.id, **fields)
+        db.session.add(recipe)
+        db.session.commit()
+        return recipe
+    return make
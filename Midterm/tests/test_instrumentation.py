@@ -0,0 +1,27 @@
+# test_instrumentation.py
+import pytest
+from flask import g
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+
+
+def test_failed_statement_leaves_no_timer(app):
+    with app.test_request_context(), db.engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql('SELECT * FROM no_such_table')
+        connection.exec_driver_sql('SELECT 1')
+        assert g._timings['db'][0] == 1  # Only the statement that succeeded
+
+
+def test_metrics_off_without_token(client):
+    assert client.get('/metrics').status_code == 404
+
+
+@pytest.mark.parametrize('app_config', [{'METRICS_TOKEN': 's3cret'}])
+def test_metrics_requires_token(client):
+    assert client.get('/metrics').status_code == 404
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 404
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert b'http_request_duration_seconds' in response.data
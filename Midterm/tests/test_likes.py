@@ -0,0 +1,45 @@
+# test_likes.py
+import pytest
+
+import likes
+import rankings
+from extensions import db
+from models import Recipe, RecipeLike
+
+
+def test_like_once(app, make_user, make_recipe):
+    user = make_user()
+    recipe_id = make_recipe(user).id
+    assert likes.like_recipe(Recipe, RecipeLike, user.id, recipe_id)
+    assert not likes.like_recipe(Recipe, RecipeLike, user.id, recipe_id)
+    assert db.session.get(Recipe, recipe_id).likes == 1
+
+
+def test_like_rolls_back_as_a_whole(app, make_user, make_recipe, monkeypatch):
+    user = make_user()
+    recipe_id = make_recipe(user).id
+
+    def fail(session, liked_at):
+        raise RuntimeError('lost the connection')
+
+    # FAILS AFTER THE LIKE ROW IS INSERTED, BEFORE THE COUNTER IS UPDATED
+    monkeypatch.setattr(rankings, 'trending_increment', fail)
+    with pytest.raises(RuntimeError):
+        likes.like_recipe(Recipe, RecipeLike, user.id, recipe_id)
+    assert db.session.scalar(db.select(db.func.count()).select_from(RecipeLike)) == 0
+    assert db.session.get(Recipe, recipe_id).likes == 0
+
+    monkeypatch.undo()
+    assert likes.like_recipe(Recipe, RecipeLike, user.id, recipe_id)
+    assert db.session.get(Recipe, recipe_id).likes == 1
+
+
+@pytest.mark.parametrize('app_config', [{'CACHE_BACKEND': 'memory', 'LIKES_BUFFERED': True,
+                                         'LIKES_FLUSH_INTERVAL': 3600}])
+def test_flush_invalidates_cached_counts(app, client, make_user, make_recipe):
+    user = make_user()
+    recipe_id = make_recipe(user).id
+    assert likes.like_recipe(Recipe, RecipeLike, user.id, recipe_id)
+    assert b'Like (1)' in client.get(f'/view_recipe/{recipe_id}').data  # 0 cached + 1 pending
+    assert likes.flush_likes(Recipe) == 1
+    assert b'Like (1)' in client.get(f'/view_recipe/{recipe_id}').data
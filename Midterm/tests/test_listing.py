@@ -0,0 +1,41 @@
+# test_listing.py
+import pytest
+from sqlalchemy import update
+
+from extensions import db
+from models import Recipe
+
+
+@pytest.mark.parametrize('url', ['/category/dessert', '/category/dessert/top', '/api/v1/categories/dessert/recipes'])
+def test_etag_changes_when_one_recipe_replaces_another(client, make_user, make_recipe, url):
+    user = make_user()
+    recipes = [make_recipe(user, title=f'Cake {i}') for i in range(3)]
+    etag = client.get(url).headers['ETag']
+
+    # SAME COUNT, VERSION SUM AND NEWEST updated_at AS BEFORE
+    newest = recipes[-1].updated_at
+    db.session.delete(recipes[0])
+    db.session.commit()
+    make_recipe(user, title='Pie', updated_at=newest)
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Pie' in response.data
+
+
+@pytest.mark.parametrize('app_config', [{'CACHE_BACKEND': 'memory'}])
+@pytest.mark.parametrize('url', ['/view_recipe/{id}', '/category/dessert', '/category/dessert/top',
+                                 '/api/v1/categories/dessert/recipes'])
+def test_update_from_another_worker_is_not_served_stale(client, make_user, make_recipe, url):
+    recipe = make_recipe(make_user())
+    url = url.format(id=recipe.id)
+    assert b'Cake' in client.get(url).data
+
+    # ANOTHER WORKER'S EDIT: THE ROW CHANGES BUT THIS WORKER'S CACHE IS NOT INVALIDATED
+    db.session.execute(update(Recipe).where(Recipe.id == recipe.id).values(title='Pie', description='Tart'))
+    db.session.commit()
+
+    response = client.get(url)
+    assert b'Pie' in response.data
+    assert b'Cake' not in response.data
+    assert b'Sweet' not in response.data  # Nor the cached description fragment
@@ -0,0 +1,74 @@
+# test_media.py
+import io
+import os
+
+import image_store
+from config import Config
+from extensions import db
+from media import delete_image
+from models import ImageRef, Job, Recipe
+
+KEY = image_store.content_key('ab' * 32, '.jpg')
+
+
+def _delete_jobs():
+    return db.session.scalars(db.select(Job.payload).where(Job.name == 'image.delete')).all()
+
+
+def test_legacy_image_is_never_deleted(app):
+    delete_image('dessert.jpg')
+    db.session.commit()
+    assert _delete_jobs() == []
+
+
+def test_stored_image_deleted_with_its_last_reference(app):
+    image_store.acquire(ImageRef, KEY)
+    image_store.acquire(ImageRef, KEY)
+    delete_image(KEY)
+    db.session.commit()
+    assert _delete_jobs() == []
+    delete_image(KEY)
+    db.session.commit()
+    assert _delete_jobs() == [{'key': KEY}]
+
+
+def test_unreferenced_key_is_not_deleted(app):
+    delete_image(KEY)
+    db.session.commit()
+    assert _delete_jobs() == []
+
+
+def test_uploads_are_stored_outside_the_static_folder(app, client, make_user):
+    from PIL import Image
+    image = io.BytesIO()
+    Image.new('RGB', (4, 4), (200, 80, 40)).save(image, 'PNG')
+    with client.session_transaction() as session:
+        session['_user_id'] = str(make_user().id)
+    response = client.post('/add_recipe', content_type='multipart/form-data', data={
+        'title': 'Cake', 'description': 'Sweet', 'category': 'dessert', 'ingredients': 'flour',
+        'instructions': 'Bake', 'image': (io.BytesIO(image.getvalue()), 'cake.png')})
+    assert response.status_code == 302
+    key = db.session.scalar(db.select(Recipe.image))
+    assert image_store.is_content_addressed(key)
+
+    store = app.config['IMAGE_STORE_FOLDER']
+    assert os.path.isfile(os.path.join(store, key))
+    assert os.listdir(image_store.tmp_folder(store)) == []  # The spool was moved into the store
+    assert client.get(f'/media/{key}').cache_control.immutable
+    assert client.get(f'/static/images/{key}').status_code == 404
+
+
+def test_store_is_not_under_static(app):
+    default = os.path.join(app.root_path, Config.IMAGE_STORE_FOLDER)
+    assert not default.startswith(app.static_folder + os.sep)
+
+
+def test_public_files_do_not_vary_on_cookie(app, client, make_user):
+    key, _ = image_store.write_image(app.config['IMAGE_STORE_FOLDER'], io.BytesIO(b'bytes'), '.png')
+    with client.session_transaction() as session:
+        session['_user_id'] = str(make_user().id)
+    for url in (f'/media/{key}', '/static/main.css'):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'Cookie' not in response.vary
+    assert 'Cookie' in client.get('/').vary  # Pages still depend on the session
@@ -0,0 +1,39 @@
+# test_query_counts.py
+"""Pin the number of SQL statements of the read-heavy routes.
+
+A new lazy load or a per-card query shows up here as a changed count.
+"""
+
+
+def _seed(make_user, make_recipe, cards=30):
+    users = [make_user(f'cook{i}') for i in range(3)]
+    return [make_recipe(users[i % 3], title=f'Cake {i}') for i in range(cards)]
+
+
+def test_index(client, count_queries, make_user, make_recipe):
+    _seed(make_user, make_recipe)
+    with count_queries() as queries:
+        assert client.get('/').status_code == 200
+    assert queries.count == 0, queries.statements
+
+
+def test_category_listing(client, count_queries, make_user, make_recipe):
+    _seed(make_user, make_recipe)
+    with count_queries() as queries:
+        assert client.get('/category/dessert').status_code == 200
+    assert queries.count == 3, queries.statements  # Validators, the page, its authors
+
+
+def test_category_listing_not_modified(client, count_queries, make_user, make_recipe):
+    _seed(make_user, make_recipe)
+    etag = client.get('/category/dessert').headers['ETag']
+    with count_queries() as queries:
+        assert client.get('/category/dessert', headers={'If-None-Match': etag}).status_code == 304
+    assert queries.count == 1, queries.statements  # Validators only
+
+
+def test_view_recipe(client, count_queries, make_user, make_recipe):
+    recipe_id = _seed(make_user, make_recipe)[0].id
+    with count_queries() as queries:
+        assert client.get(f'/view_recipe/{recipe_id}').status_code == 200
+    assert queries.count == 2, queries.statements  # Validators, the detail
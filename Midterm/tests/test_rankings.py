@@ -0,0 +1,17 @@
+# test_rankings.py
+import rankings
+from extensions import db
+from models import RankingState
+
+
+def test_epoch_seeded_with_the_table(app):
+    assert db.session.scalar(db.select(db.func.count()).select_from(RankingState)) == 1
+
+
+def test_missing_epoch_added_once(app):
+    db.session.execute(db.delete(RankingState))
+    db.session.commit()
+    with db.engine.begin() as connection:
+        epoch = rankings.get_epoch(connection)
+    assert rankings.get_epoch(db.session) == epoch
+    assert db.session.scalar(db.select(db.func.count()).select_from(RankingState)) == 1
@@ -0,0 +1,40 @@
+# test_recipe_io.py
+import json
+
+import search_index
+from extensions import db
+from models import Recipe
+
+
+def test_import_skips_rows_with_bad_likes(app, make_user):
+    make_user('cook')
+    rows = [{'title': 'Cake', 'username': 'cook', 'likes': '3'},
+            {'title': 'Pie', 'username': 'cook', 'likes': 'many'},
+            {'title': 'Tart', 'username': 'cook', 'likes': -1},
+            {'title': 'Bun', 'username': 'cook'}]
+    source = ''.join(json.dumps(row) + '\n' for row in rows)
+    result = app.test_cli_runner().invoke(args=['recipes', 'import', '--format', 'jsonl'], input=source)
+    assert result.exit_code == 0, result.output
+    assert "Row 2: likes must be a whole number, not 'many'" in result.output
+    assert 'Row 3: likes must be a whole number, not -1' in result.output
+    assert 'Imported 2 recipes (2 skipped)' in result.output
+    assert sorted(Recipe.query.with_entities(Recipe.title, Recipe.likes)) == [('Bun', 0), ('Cake', 3)]
+
+
+def test_import_keeps_search_index_live(app, make_user):
+    make_user('cook')
+    source = json.dumps({'title': 'Lemon tart', 'username': 'cook'}) + '\n'
+    assert app.test_cli_runner().invoke(args=['recipes', 'import'], input=source).exit_code == 0
+    with db.engine.connect() as connection:
+        assert connection.execute(search_index.match_statement('"lemon"', 10, 0)).all()
+        triggers = connection.execute(db.text("SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar()
+    assert triggers == len(search_index.FTS_TRIGGERS)
+
+
+def test_ensure_search_index_restores_lost_triggers(app, make_user, make_recipe):
+    with db.engine.begin() as connection:
+        search_index.drop_search_triggers(connection)
+    make_recipe(make_user(), title='Lemon tart')
+    with db.engine.begin() as connection:
+        search_index.ensure_search_index(connection)
+        assert connection.execute(search_index.match_statement('"lemon"', 10, 0)).all()
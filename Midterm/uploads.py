@@ -0,0 +1,44 @@
+# uploads.py
+from flask import Request, current_app
+
+import image_pipeline
+from image_store import HashedUpload
+
+# LEADING BYTES OF EACH ACCEPTED IMAGE TYPE, AND THE EXTENSION IT IS STORED WITH
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+)
+
+
+def sniff_image_type(head):
+    """Extension for an image starting with ``head``, or None if it is not one.
+
+    The browser-supplied filename and content type are not trusted.
+    """
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def upload_head(upload):
+    """First bytes of an uploaded FileStorage, without consuming its stream."""
+    stream = upload.stream
+    if isinstance(stream, HashedUpload):
+        return stream.head
+    position = stream.tell()
+    head = stream.read(HashedUpload.HEAD_SIZE)
+    stream.seek(position)
+    return head
+
+
+class UploadRequest(Request):
+    """Request whose file uploads stream straight into the image store."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return HashedUpload(image_pipeline.store_folder(),
+                            max_size=current_app.config['IMAGE_MAX_BYTES'])
@@ -0,0 +1,13 @@
+# wsgi.py
+"""WSGI entry point.
+
+    SERVER_MODE=gthread gunicorn -c gunicorn.conf.py
+    gunicorn --preload --workers 4 wsgi:app
+
+With ``--preload`` the master imports the code and builds the app once;
+the workers fork from it and share those pages copy-on-write instead of
+each importing everything again.
+"""
+from app import create_app
+
+app = create_app()